@@ -4,26 +4,54 @@ Admin endpoints for system management
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, insert, func
+from typing import List, Optional
+from datetime import datetime, timedelta
 from uuid import UUID
+import asyncio
+import zlib
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.config import settings
+from app.core.database import (
+    get_db,
+    get_read_db,
+    execute_write,
+    commit_if_dirty,
+    upsert_insert,
+    AsyncSessionLocal,
+    UnitOfWorkRoute
+)
+from app.core.scheduler import PeriodicTask
+from app.core.security import get_current_db_user, invalidate_cached_user
+from app.models.medical import AggregateWatermark, HealthCohortWeekly, HealthRollup
 from app.models.user import User
 from app.schemas.user import UserResponse
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Watermark name of the weekly cohort aggregate
+COHORT_AGGREGATE = "health_cohort_weekly"
+
+# PostgreSQL advisory lock held while a process rebuilds the cohorts
+COHORT_LOCK_ID = zlib.crc32(COHORT_AGGREGATE.encode()) & 0x7FFFFFFF
+
+# Rollups written this long before the last refresh are looked at again,
+# so rows from transactions still open at that point aren't missed
+COHORT_REFRESH_OVERLAP = timedelta(minutes=5)
+
+# Weeks rebuilt per statement, and the longest range analytics may cover
+COHORT_CHUNK_WEEKS = 100
+COHORT_MAX_WEEKS = 104
 
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
-    current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: Optional[User] = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all users (Admin only)"""
     # Verify admin role
-    if current_user.get("role") != "admin":
+    if not current_user or current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can access this endpoint"
@@ -41,12 +69,12 @@ async def get_all_users(
 async def update_user_role(
     user_id: str,
     new_role: str,
-    current_user: dict = Depends(get_current_user),
+    current_user: Optional[User] = Depends(get_current_db_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user role (Admin only)"""
     # Verify admin role
-    if current_user.get("role") != "admin":
+    if not current_user or current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update user roles"
@@ -73,7 +101,7 @@ async def update_user_role(
         )
     
     # Prevent admin from removing their own admin role
-    if user.id == UUID(current_user.get("id")) and new_role != "admin":
+    if user.id == current_user.id and new_role != "admin":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot remove your own admin role"
@@ -81,5 +109,209 @@ async def update_user_role(
     
     user.role = new_role
     await db.commit()
+    invalidate_cached_user(user)
     
     return {"message": f"User role updated to {new_role}"}
+
+
+# ==================== Health analytics ====================
+
+async def _refresh_cohorts(db: AsyncSession) -> dict:
+    rollups = HealthRollup.__table__
+    cohorts = HealthCohortWeekly.__table__
+    marks = AggregateWatermark.__table__
+    weekly = rollups.c.period == "week"
+    
+    if db.get_bind().dialect.name == "postgresql":
+        # Serialize refreshes across processes: two would delete and insert
+        # the same (village, week_start) rows and one would fail on the key
+        await db.execute(select(func.pg_advisory_xact_lock(COHORT_LOCK_ID)))
+    
+    now = (await db.execute(select(func.now()))).scalar_one()
+    result = await db.execute(
+        select(marks.c.refreshed_through).where(marks.c.name == COHORT_AGGREGATE)
+    )
+    watermark = result.scalar_one_or_none()
+    
+    if watermark is None:
+        # First run: build every week
+        result = await db.execute(select(rollups.c.period_start).where(weekly).distinct())
+        weeks = set(result.scalars().all())
+        await db.execute(cohorts.delete())
+    else:
+        since = watermark - COHORT_REFRESH_OVERLAP
+        result = await db.execute(
+            select(rollups.c.period_start).where(weekly, rollups.c.updated_at > since).distinct()
+        )
+        weeks = set(result.scalars().all())
+        # A user who changed village moves all of their weeks
+        result = await db.execute(
+            select(rollups.c.period_start)
+            .join(User, User.id == rollups.c.user_id)
+            .where(weekly, User.updated_at > since)
+            .distinct()
+        )
+        weeks.update(result.scalars().all())
+    
+    village = func.coalesce(func.trim(User.village), "")
+    columns = [
+        "village", "week_start", "users_reporting", "days_logged", "steps_total",
+        "steps_goal_days", "water_total", "water_goal_days", "sleep_hours_sum",
+        "sleep_users", "updated_at"
+    ]
+    ordered = sorted(weeks)
+    for i in range(0, len(ordered), COHORT_CHUNK_WEEKS):
+        chunk = ordered[i:i + COHORT_CHUNK_WEEKS]
+        await db.execute(cohorts.delete().where(cohorts.c.week_start.in_(chunk)))
+        await db.execute(
+            insert(cohorts).from_select(
+                columns,
+                select(
+                    village,
+                    rollups.c.period_start,
+                    func.count(),
+                    func.sum(rollups.c.days_logged),
+                    func.sum(rollups.c.steps_total),
+                    func.sum(rollups.c.steps_goal_days),
+                    func.sum(rollups.c.water_total),
+                    func.sum(rollups.c.water_goal_days),
+                    func.coalesce(func.sum(rollups.c.sleep_hours_avg), 0),
+                    func.count(rollups.c.sleep_hours_avg),
+                    func.now()
+                )
+                .select_from(rollups.outerjoin(User, User.id == rollups.c.user_id))
+                .where(weekly, rollups.c.period_start.in_(chunk), rollups.c.days_logged > 0)
+                .group_by(village, rollups.c.period_start)
+            )
+        )
+    
+    mark = upsert_insert(db, marks).values(name=COHORT_AGGREGATE, refreshed_through=now)
+    await db.execute(
+        mark.on_conflict_do_update(
+            index_elements=[marks.c.name],
+            set_={"refreshed_through": mark.excluded.refreshed_through}
+        )
+    )
+    return {"weeks_refreshed": len(weeks), "full": watermark is None}
+
+
+_cohort_refresh_lock = asyncio.Lock()
+
+
+async def refresh_health_cohorts() -> dict:
+    """Rebuild the weekly cohort rows for weeks whose rollups changed.
+    
+    Reads the per-user weekly rollups, never daily_health. The first run
+    (no watermark yet) builds every week. One refresh runs at a time: the
+    schedule and a manual refresh wait for each other (across processes
+    too, on PostgreSQL).
+    """
+    async with _cohort_refresh_lock:
+        async with AsyncSessionLocal() as db:
+            result = await execute_write(db, _refresh_cohorts)
+            await commit_if_dirty(db)
+    return result
+
+
+cohort_refresher = PeriodicTask(
+    "Health cohort refresh",
+    refresh_health_cohorts,
+    settings.COHORT_REFRESH_SECONDS
+)
+
+
+def _require_analytics_access(user: Optional[User]) -> None:
+    if not user or user.role not in ("admin", "doctor"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins and doctors can access health analytics"
+        )
+
+
+@router.get("/analytics/health")
+async def get_health_analytics(
+    group_by: str = "week",
+    weeks: int = 12,
+    village: Optional[str] = None,
+    current_user: Optional[User] = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Cohort health trends by week or by village (Admins and doctors)
+    
+    Covers the last ``weeks`` weeks, optionally for one village ("" for
+    users without one). Served from the weekly cohort table, which lags
+    writes by up to COHORT_REFRESH_SECONDS.
+    """
+    _require_analytics_access(current_user)
+    if group_by not in ("week", "village") or not 1 <= weeks <= COHORT_MAX_WEEKS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"group_by must be week or village; weeks 1-{COHORT_MAX_WEEKS}"
+        )
+    
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+    key = HealthCohortWeekly.week_start if group_by == "week" else HealthCohortWeekly.village
+    
+    query = select(
+        key,
+        func.count(func.distinct(HealthCohortWeekly.week_start)),
+        func.sum(HealthCohortWeekly.users_reporting),
+        func.sum(HealthCohortWeekly.days_logged),
+        func.sum(HealthCohortWeekly.steps_total),
+        func.sum(HealthCohortWeekly.steps_goal_days),
+        func.sum(HealthCohortWeekly.water_total),
+        func.sum(HealthCohortWeekly.water_goal_days),
+        func.sum(HealthCohortWeekly.sleep_hours_sum),
+        func.sum(HealthCohortWeekly.sleep_users)
+    ).where(HealthCohortWeekly.week_start >= since)
+    if village is not None:
+        query = query.where(HealthCohortWeekly.village == village.strip())
+    result = await db.execute(query.group_by(key).order_by(key))
+    
+    rows = []
+    for group, week_count, users, days, steps, steps_met, water, water_met, sleep_sum, sleep_users in result.all():
+        rows.append({
+            group_by: str(group) if group_by == "week" else (group or None),
+            "weeks": week_count,
+            "users_per_week": round(users / week_count, 1),
+            "days_logged": days,
+            "steps_avg": round(steps / days) if days else 0,
+            "steps_goal_rate": round(steps_met / days, 3) if days else None,
+            "water_avg": round(water / days, 1) if days else 0,
+            "water_goal_rate": round(water_met / days, 3) if days else None,
+            "sleep_hours_avg": round(sleep_sum / sleep_users, 2) if sleep_users else None
+        })
+    
+    result = await db.execute(
+        select(AggregateWatermark.refreshed_through).where(AggregateWatermark.name == COHORT_AGGREGATE)
+    )
+    refreshed_through = result.scalar_one_or_none()
+    
+    return {
+        "group_by": group_by,
+        "since": str(since),
+        "refreshed_through": refreshed_through.isoformat() if refreshed_through else None,
+        "rows": rows
+    }
+
+
+@router.post("/analytics/health/refresh")
+async def refresh_health_analytics(
+    current_user: Optional[User] = Depends(get_current_db_user)
+):
+    """Refresh the cohort table now instead of waiting for the schedule (Admin only)"""
+    if not current_user or current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can refresh health analytics"
+        )
+    
+    try:
+        return await cohort_refresher.run_once()
+    except Exception:
+        # run_once has logged the error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Health analytics refresh failed"
+        )
@@ -2,23 +2,71 @@
 Authentication endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, end_read, upsert_insert, UnitOfWorkRoute
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    get_current_db_user,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
+    create_refresh_token,
+    hash_refresh_token,
     verify_supabase_token
 )
 from app.core.config import settings
-from app.schemas.user import UserCreate, UserLogin, Token, UserResponse
-from app.models.user import User
-from sqlalchemy import select
+from app.core.streaming import is_ndjson, iter_ndjson, read_json
+from app.schemas.user import UserCreate, UserLogin, Token, UserResponse, RefreshTokenRequest
+from app.models.user import User, RefreshToken
+from sqlalchemy import select, update, or_, func
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Rows per INSERT ... ON CONFLICT statement in bulk user sync
+SYNC_CHUNK_SIZE = 500
+
+
+def issue_tokens(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    email: str,
+    family_id: Optional[uuid.UUID] = None
+) -> Token:
+    """Create an access token and a new refresh token (added to the session)."""
+    access_token = create_access_token(
+        data={"sub": str(user_id), "email": email},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    
+    refresh_token, token_hash = create_refresh_token()
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=token_hash,
+        family_id=family_id or uuid.uuid4(),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    
+    return Token(
+        access_token=access_token,
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        refresh_token=refresh_token
+    )
+
+
+async def revoke_token_family(db: AsyncSession, family_id: uuid.UUID) -> None:
+    """Revoke every live refresh token rotated from the same login."""
+    await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_(None)
+        )
+        .values(revoked_at=datetime.utcnow())
+    )
 
 
 @router.post("/register", response_model=Token)
@@ -38,7 +86,8 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    await end_read(db)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -47,16 +96,10 @@ async def register(
     )
     
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
-    
-    # Create access token
-    access_token = create_access_token(
-        data={"sub": str(new_user.id), "email": new_user.email},
-        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
+    await db.flush()
     
-    return Token(access_token=access_token)
+    # Create access and refresh tokens
+    return issue_tokens(db, new_user.id, new_user.email)
 
 
 @router.post("/login", response_model=Token)
@@ -68,21 +111,85 @@ async def login(
     # Find user
     result = await db.execute(select(User).where(User.email == credentials.email))
     user = result.scalar_one_or_none()
+    await end_read(db)
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not user.hashed_password or not await verify_password_async(
+        credentials.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
-    access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
-        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Create access and refresh tokens
+    return issue_tokens(db, user.id, user.email)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(
+    data: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Exchange a refresh token for a new access token and refresh token.
+    
+    The presented refresh token is rotated (revoked and replaced). Presenting
+    an already rotated token revokes its whole family, since it means the
+    token was copied.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    result = await db.execute(
+        select(RefreshToken, User.email)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(data.refresh_token))
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise invalid
+    
+    stored, email = row
+    now = datetime.utcnow()
+    if stored.expires_at <= now:
+        raise invalid
+    
+    # Revoke atomically so two concurrent refreshes can't both succeed
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.id == stored.id,
+            RefreshToken.revoked_at.is_(None)
+        )
+        .values(revoked_at=now)
+    )
+    if rotated.rowcount != 1:
+        # Commit before raising: the revocation must survive the 401
+        await revoke_token_family(db, stored.family_id)
+        await db.commit()
+        raise invalid
+    
+    return issue_tokens(db, stored.user_id, email, family_id=stored.family_id)
+
+
+@router.post("/logout")
+async def logout(
+    data: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Revoke a refresh token and every token rotated from the same login."""
+    result = await db.execute(
+        select(RefreshToken.family_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(data.refresh_token))
     )
+    family_id = result.scalar_one_or_none()
+    if family_id is not None:
+        await revoke_token_family(db, family_id)
     
-    return Token(access_token=access_token)
+    return {"message": "Logged out"}
 
 
 @router.post("/verify-supabase", response_model=dict)
@@ -119,7 +226,6 @@ async def sync_supabase_user(
         # Update supabase_id if needed
         if not user.supabase_id:
             user.supabase_id = supabase_id
-            await db.commit()
         return {"message": "User synced", "user_id": str(user.id)}
     
     # Create new user
@@ -130,7 +236,135 @@ async def sync_supabase_user(
     )
     
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+    await db.flush()
     
     return {"message": "User created", "user_id": str(new_user.id)}
+
+
+async def _iter_sync_records(request: Request) -> AsyncIterator[dict]:
+    """Yield Supabase user objects from a JSON array or an NDJSON stream."""
+    if is_ndjson(request):
+        async for record in iter_ndjson(request):
+            yield record
+        return
+    
+    body = await read_json(request)
+    if isinstance(body, dict):
+        body = body.get("users")
+    if not isinstance(body, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array of users or NDJSON"
+        )
+    for item in body:
+        yield item
+
+
+async def _upsert_user_chunk(db: AsyncSession, chunk: List[dict]) -> tuple:
+    """Upsert one chunk of users by email. Returns (created, updated, skipped)."""
+    emails = [row["email"] for row in chunk]
+    supabase_ids = [row["supabase_id"] for row in chunk]
+    
+    # One lookup per chunk tells us which rows are updates and which
+    # supabase_ids already belong to a different email
+    result = await db.execute(
+        select(User.email, User.supabase_id).where(
+            or_(User.email.in_(emails), User.supabase_id.in_(supabase_ids))
+        )
+    )
+    existing_emails = set()
+    supabase_owners = {}
+    for email, supabase_id in result.all():
+        existing_emails.add(email)
+        if supabase_id:
+            supabase_owners[supabase_id] = email
+    
+    rows = [
+        row for row in chunk
+        if supabase_owners.get(row["supabase_id"], row["email"]) == row["email"]
+    ]
+    skipped = len(chunk) - len(rows)
+    if not rows:
+        return 0, 0, skipped
+    
+    stmt = upsert_insert(db, User.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.email],
+        set_={
+            "supabase_id": func.coalesce(User.supabase_id, stmt.excluded.supabase_id),
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(stmt)
+    
+    updated = sum(1 for row in rows if row["email"] in existing_emails)
+    return len(rows) - updated, updated, skipped
+
+
+@router.post("/sync-supabase-users")
+async def sync_supabase_users(
+    request: Request,
+    current_user: Optional[User] = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk-sync Supabase users to the local database (Admin only).
+    
+    Accepts a JSON array of Supabase user objects (or {"users": [...]}), or
+    an NDJSON stream with Content-Type application/x-ndjson, optionally
+    gzipped (Content-Encoding: gzip). Users are upserted by email in chunks
+    inside a single transaction.
+    """
+    if not current_user or current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can bulk-sync users"
+        )
+    
+    received = created = updated = skipped = 0
+    invalid: List[int] = []
+    chunk: dict = {}
+    seen_supabase_ids: dict = {}
+    
+    async def flush() -> None:
+        nonlocal created, updated, skipped
+        if chunk:
+            c, u, s = await _upsert_user_chunk(db, list(chunk.values()))
+            created, updated, skipped = created + c, updated + u, skipped + s
+            chunk.clear()
+            seen_supabase_ids.clear()
+    
+    async for record in _iter_sync_records(request):
+        received += 1
+        email = record.get("email") if isinstance(record, dict) else None
+        supabase_id = record.get("id") if isinstance(record, dict) else None
+        if not email or not supabase_id:
+            invalid.append(received - 1)
+            continue
+        
+        # Dedupe within a chunk: one statement may not touch a row twice
+        if seen_supabase_ids.get(supabase_id, email) != email:
+            skipped += 1
+            continue
+        if email in chunk:
+            skipped += 1
+        seen_supabase_ids[supabase_id] = email
+        chunk[email] = {
+            "id": uuid.uuid4(),
+            "email": email,
+            "supabase_id": supabase_id,
+            "full_name": (record.get("user_metadata") or {}).get("name")
+        }
+        
+        if len(chunk) >= SYNC_CHUNK_SIZE:
+            await flush()
+    
+    await flush()
+    
+    return {
+        "received": received,
+        "created": created,
+        "updated": updated,
+        "skipped": skipped,
+        "invalid": len(invalid),
+        "invalid_indexes": invalid[:100]
+    }
@@ -9,7 +9,7 @@ from typing import List
 from datetime import datetime
 from uuid import UUID
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, UnitOfWorkRoute
 from app.core.security import get_current_user
 from app.schemas.medical import (
     TestBookingCreate,
@@ -21,7 +21,7 @@ from app.schemas.medical import (
 )
 from app.models.medical import TestBooking, DoctorAppointment
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 # ==================== TEST BOOKINGS ====================
@@ -63,8 +63,7 @@ async def create_test_booking(
     )
     
     db.add(test_booking)
-    await db.commit()
-    await db.refresh(test_booking)
+    await db.flush()
     
     return test_booking
 
@@ -72,7 +71,7 @@ async def create_test_booking(
 @router.get("/tests", response_model=List[TestBookingResponse])
 async def get_test_bookings(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all test bookings for current user."""
     user_id = current_user.get("id")
@@ -89,7 +88,7 @@ async def get_test_bookings(
 async def get_test_booking(
     booking_id: str,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get specific test booking."""
     user_id = current_user.get("id")
@@ -147,8 +146,7 @@ async def update_test_booking(
             else:
                 setattr(booking, field, value)
     
-    await db.commit()
-    await db.refresh(booking)
+    await db.flush()
     
     return booking
 
@@ -180,7 +178,6 @@ async def delete_test_booking(
     
     # Mark as cancelled instead of deleting
     booking.status = "cancelled"
-    await db.commit()
     
     return {"message": "Test booking cancelled"}
 
@@ -231,8 +228,7 @@ async def create_doctor_appointment(
     )
     
     db.add(appointment)
-    await db.commit()
-    await db.refresh(appointment)
+    await db.flush()
     
     return appointment
 
@@ -240,7 +236,7 @@ async def create_doctor_appointment(
 @router.get("/doctors", response_model=List[DoctorAppointmentResponse])
 async def get_doctor_appointments(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all doctor appointments for current user."""
     user_id = current_user.get("id")
@@ -257,7 +253,7 @@ async def get_doctor_appointments(
 async def get_doctor_appointment(
     appointment_id: str,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get specific doctor appointment."""
     user_id = current_user.get("id")
@@ -315,8 +311,7 @@ async def update_doctor_appointment(
             else:
                 setattr(appointment, field, value)
     
-    await db.commit()
-    await db.refresh(appointment)
+    await db.flush()
     
     return appointment
 
@@ -348,7 +343,6 @@ async def cancel_doctor_appointment(
     
     # Mark as cancelled instead of deleting
     appointment.status = "cancelled"
-    await db.commit()
     
     return {"message": "Doctor appointment cancelled"}
 
@@ -358,7 +352,7 @@ async def cancel_doctor_appointment(
 @router.get("/doctors/my-appointments", response_model=List[DoctorAppointmentResponse])
 async def get_my_appointments(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all appointments for the current doctor"""
     doctor_id = current_user.get("id")
@@ -2,25 +2,98 @@
 AI Chat endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Sequence
+from contextlib import aclosing
+from datetime import datetime, timezone
 from uuid import UUID
+import asyncio
 import openai
-
-from app.core.database import get_db
+import time
+
+from app.core.database import (
+    get_db,
+    get_read_db,
+    execute_write,
+    commit_if_dirty,
+    on_commit,
+    AsyncSessionLocal,
+    AsyncReadSessionLocal,
+    UnitOfWorkRoute
+)
 from app.core.security import get_current_user
 from app.core.config import settings
+from app.core.response_cache import ResponseCache
+from app.core.single_flight import SingleFlight
+from app.core.llm_dispatcher import LLMDispatcher, LLMOverloaded
+from app.core.conversation import (
+    ConversationCache,
+    Turn,
+    context_messages,
+    count_tokens,
+    MESSAGE_OVERHEAD_TOKENS
+)
+from app.core.streaming import sse_event
 from app.schemas.medical import ChatMessage, ChatResponse
 from app.models.medical import ChatHistory
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
-# Initialize OpenAI client
+# Initialize OpenAI client (retries are left to llm_dispatcher)
 openai_client = None
 if settings.OPENAI_API_KEY:
-    openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate limits, server errors and dropped connections are worth retrying."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if getattr(error, "code", None) == "insufficient_quota":
+        return False
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+# Upstream calls, most urgent chat type first. When the queue is full or
+# a call would wait too long, the user gets the fallback answer right away.
+llm_dispatcher = LLMDispatcher(
+    lanes=["medical", "nutrition", "general"],
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff=settings.LLM_RETRY_BACKOFF_SECONDS,
+    retryable=is_retryable_error
+)
+
+# Answers to repeated questions, per system prompt (see prompt_key).
+# Fallback answers are never cached, so an outage doesn't outlive itself.
+# Medical questions are only answered from cache when asked the same way.
+response_cache = ResponseCache(
+    maxsize=settings.CHAT_CACHE_MAX_SIZE,
+    ttl=settings.CHAT_CACHE_TTL_SECONDS,
+    similarity=settings.CHAT_CACHE_SIMILARITY,
+    index_size=settings.CHAT_CACHE_SIMILAR_WINDOW,
+    exact_namespaces=["medical"]
+)
+
+# Identical questions asked at the same time (e.g. after a broadcast tip)
+# share one upstream call instead of each starting their own
+chat_flights = SingleFlight(timeout=settings.CHAT_COALESCE_TIMEOUT_SECONDS)
+
+# Recent turns of each user's conversations, so follow-up questions carry
+# context without re-reading chat_history for every message
+conversations = ConversationCache(
+    maxsize=settings.CHAT_CONTEXT_CACHE_MAX_SIZE,
+    ttl=settings.CHAT_CONTEXT_CACHE_TTL_SECONDS,
+    max_turns=settings.CHAT_CONTEXT_MAX_TURNS,
+    max_age=settings.CHAT_CONTEXT_MAX_AGE_MINUTES * 60
+)
 
 
 # System prompts for different chat types
@@ -91,28 +164,200 @@ Always be supportive, helpful, and recommend professional help when needed."""
 }
 
 
-async def get_ai_response(message: str, chat_type: str = "general") -> str:
-    """Get AI response using OpenAI."""
+def prompt_key(chat_type: Optional[str]) -> str:
+    """The SYSTEM_PROMPTS entry used for a (client-supplied) chat type."""
+    return chat_type if chat_type in SYSTEM_PROMPTS else "general"
+
+
+def build_chat_request(message: str, chat_type: str, history: Sequence[dict] = ()) -> dict:
+    """Arguments for chat.completions.create for a user message, after the conversation so far."""
+    system_prompt = SYSTEM_PROMPTS[prompt_key(chat_type)]
+    return {
+        "model": settings.OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            *history,
+            {"role": "user", "content": message}
+        ],
+        "max_tokens": 800,
+        "temperature": 0.7
+    }
+
+
+def estimate_request_tokens(request: dict) -> int:
+    """Tokens a chat request can use: its prompt plus the answer limit."""
+    prompt_tokens = sum(
+        count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in request["messages"]
+    )
+    return prompt_tokens + request["max_tokens"]
+
+
+def _epoch_seconds(created_at: Optional[datetime]) -> float:
+    if created_at is None:
+        return 0.0
+    if created_at.tzinfo is None:
+        # SQLite returns CURRENT_TIMESTAMP (UTC) without a zone
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.timestamp()
+
+
+async def load_conversation(request: Request, user_id: str, chat_type: Optional[str]) -> List[dict]:
+    """Context messages for the user's next message of this chat type.
+    
+    Recent turns come from ``conversations``; chat_history is read only
+    when they aren't cached. They are trimmed to CHAT_CONTEXT_TOKENS, with
+    summaries of older turns within CHAT_CONTEXT_SUMMARY_TOKENS. Empty when
+    context is disabled, OpenAI isn't configured or the turns can't be loaded.
+    """
+    if not settings.CHAT_CONTEXT_TOKENS or not openai_client:
+        return []
+    
+    turns = conversations.get(user_id, chat_type)
+    if turns is None:
+        query = (
+            select(ChatHistory.id, ChatHistory.message, ChatHistory.response, ChatHistory.created_at)
+            .where(ChatHistory.user_id == UUID(user_id))
+            .where(ChatHistory.chat_type == chat_type if chat_type else ChatHistory.chat_type.is_(None))
+            .order_by(ChatHistory.created_at.desc())
+            .limit(settings.CHAT_CONTEXT_MAX_TURNS)
+        )
+        try:
+            async with AsyncReadSessionLocal(info={"request": request}) as session:
+                rows = (await session.execute(query)).all()
+        except Exception as e:
+            print(f"Failed to load chat context: {e}")
+            return []
+        turns = conversations.put(user_id, chat_type, [
+            Turn(row.id, row.message, row.response, _epoch_seconds(row.created_at))
+            for row in reversed(rows)
+        ])
+    
+    return context_messages(turns, settings.CHAT_CONTEXT_TOKENS, settings.CHAT_CONTEXT_SUMMARY_TOKENS)
+
+
+async def get_ai_response(message: str, chat_type: str = "general", history: Sequence[dict] = ()) -> str:
+    """Get AI response using OpenAI, or a cached answer to the same question.
+    
+    ``history`` is the conversation so far (see load_conversation). Without
+    it, concurrent requests for the same message (ignoring surrounding and
+    repeated whitespace) share one upstream call; answers that build on a conversation are
+    neither cached nor shared. Upstream calls go through llm_dispatcher
+    and either way are bounded by CHAT_COALESCE_TIMEOUT_SECONDS. If the
+    call fails, times out or can't get a slot, the fallback response is
+    returned.
+    """
+    chat_type = prompt_key(chat_type)
     if not openai_client:
         return get_fallback_response(message, chat_type)
     
+    if not history:
+        cached = response_cache.get(chat_type, message)
+        if cached is not None:
+            return cached
+    
+    async def complete() -> str:
+        request = build_chat_request(message, chat_type, history)
+        estimate = estimate_request_tokens(request)
+        response = await llm_dispatcher.call(
+            chat_type,
+            estimate,
+            lambda: openai_client.chat.completions.create(**request)
+        )
+        if response.usage is not None:
+            llm_dispatcher.charge(response.usage.total_tokens - estimate)
+        answer = response.choices[0].message.content
+        if answer and not history:
+            response_cache.set(chat_type, message, answer)
+        return answer
+    
     try:
-        system_prompt = SYSTEM_PROMPTS.get(chat_type, SYSTEM_PROMPTS["general"])
-        
-        response = await openai_client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": message}
-            ],
-            max_tokens=800,
-            temperature=0.7
+        if history:
+            return await asyncio.wait_for(complete(), settings.CHAT_COALESCE_TIMEOUT_SECONDS)
+        key = (chat_type, " ".join(message.split()), settings.OPENAI_MODEL)
+        return await chat_flights.do(key, complete)
+    except LLMOverloaded:
+        return get_fallback_response(message, chat_type)
+    except Exception as e:
+        print(f"OpenAI API error: {e!r}")
+        return get_fallback_response(message, chat_type)
+
+
+async def stream_ai_response(
+    message: str,
+    chat_type: str = "general",
+    history: Sequence[dict] = ()
+) -> AsyncIterator[str]:
+    """Yield the AI response in pieces as the model produces them.
+    
+    ``history`` is the conversation so far, as for get_ai_response.
+    Without it, a cached answer is yielded whole. Falls back to the canned response
+    (as a single piece) when OpenAI is unavailable, no dispatcher slot is
+    free in time, or the model fails before the first token. A failure
+    after that is raised, since part of the answer has already been sent.
+    The dispatcher slot is held until the stream ends. The upstream stream
+    is closed however iteration ends, including when the consumer stops
+    early, so an abandoned completion stops generating; only fully
+    received answers without history are cached.
+    """
+    chat_type = prompt_key(chat_type)
+    if not openai_client:
+        yield get_fallback_response(message, chat_type)
+        return
+    
+    if not history:
+        cached = response_cache.get(chat_type, message)
+        if cached is not None:
+            yield cached
+            return
+    
+    request = build_chat_request(message, chat_type, history)
+    try:
+        await llm_dispatcher.acquire(chat_type, estimate_request_tokens(request))
+    except LLMOverloaded:
+        yield get_fallback_response(message, chat_type)
+        return
+    
+    stream = None
+    parts = []
+    try:
+        stream = await llm_dispatcher.retry(
+            lambda: openai_client.chat.completions.create(**request, stream=True)
         )
-        
-        return response.choices[0].message.content
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        if parts and not history:
+            response_cache.set(chat_type, message, "".join(parts))
     except Exception as e:
         print(f"OpenAI API error: {e}")
-        return get_fallback_response(message, chat_type)
+        if parts:
+            raise
+        yield get_fallback_response(message, chat_type)
+    finally:
+        if stream is not None:
+            await stream.close()
+        llm_dispatcher.release()
+
+
+async def save_chat_history(user_id: str, message: str, response: str, chat_type: Optional[str]) -> ChatHistory:
+    """Store a chat exchange in a session of its own (for use outside a request's unit of work)."""
+    async def save_chat(session: AsyncSession) -> ChatHistory:
+        chat_entry = ChatHistory(
+            user_id=UUID(user_id),
+            message=message,
+            response=response,
+            chat_type=chat_type
+        )
+        session.add(chat_entry)
+        return chat_entry
+    
+    async with AsyncSessionLocal() as session:
+        chat_entry = await execute_write(session, save_chat)
+        await commit_if_dirty(session)
+    return chat_entry
 
 
 def get_fallback_response(message: str, chat_type: str) -> str:
@@ -204,29 +449,40 @@ How can I assist you today?
 @router.post("/send", response_model=dict)
 async def send_message(
     chat_message: ChatMessage,
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Send a message and get AI response."""
+    """Send a message and get AI response (in the context of the recent conversation)."""
     user_id = current_user.get("id")
+    history = await load_conversation(request, user_id, chat_message.chat_type)
     
     # Get AI response
     response = await get_ai_response(
         chat_message.message,
-        chat_message.chat_type or "general"
+        chat_message.chat_type or "general",
+        history
     )
     
     # Save to history
-    try:
+    async def save_chat(session: AsyncSession) -> ChatHistory:
         chat_entry = ChatHistory(
             user_id=UUID(user_id),
             message=chat_message.message,
             response=response,
             chat_type=chat_message.chat_type
         )
-        db.add(chat_entry)
-        await db.commit()
-        await db.refresh(chat_entry)
+        session.add(chat_entry)
+        return chat_entry
+    
+    try:
+        chat_entry = await execute_write(db, save_chat)
+        await commit_if_dirty(db)
+        conversations.append(
+            user_id,
+            chat_message.chat_type,
+            Turn(chat_entry.id, chat_message.message, response, time.time())
+        )
         
         return {
             "id": str(chat_entry.id),
@@ -237,6 +493,7 @@ async def send_message(
         }
     except Exception as e:
         # Return response even if saving fails
+        await db.rollback()
         return {
             "message": chat_message.message,
             "response": response,
@@ -244,12 +501,70 @@ async def send_message(
         }
 
 
+@router.post("/stream")
+async def stream_message(
+    chat_message: ChatMessage,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Send a message and stream the AI response as server-sent events.
+    
+    Emits ``delta`` events ({"content": text}) as tokens arrive, then one
+    ``done`` event with the saved chat entry, or an ``error`` event if the
+    model fails partway. The exchange is saved once the response is
+    complete; if the client disconnects first, the upstream completion
+    is cancelled and nothing is saved.
+    """
+    user_id = current_user.get("id")
+    chat_type = chat_message.chat_type or "general"
+    history = await load_conversation(request, user_id, chat_message.chat_type)
+    
+    async def events() -> AsyncIterator[str]:
+        parts = []
+        try:
+            async with aclosing(stream_ai_response(chat_message.message, chat_type, history)) as deltas:
+                async for delta in deltas:
+                    if await request.is_disconnected():
+                        return
+                    parts.append(delta)
+                    yield sse_event("delta", {"content": delta})
+        except Exception:
+            yield sse_event("error", {"detail": "The response was interrupted"})
+            return
+        
+        response = "".join(parts)
+        done = {
+            "message": chat_message.message,
+            "response": response,
+            "chat_type": chat_message.chat_type
+        }
+        try:
+            chat_entry = await save_chat_history(user_id, chat_message.message, response, chat_message.chat_type)
+            done.update(id=str(chat_entry.id), created_at=str(chat_entry.created_at))
+            conversations.append(
+                user_id,
+                chat_message.chat_type,
+                Turn(chat_entry.id, chat_message.message, response, time.time())
+            )
+        except Exception as e:
+            # Deliver the response even if saving fails
+            print(f"Failed to save chat history: {e}")
+        yield sse_event("done", done)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies (nginx) must pass each event through as it's written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history", response_model=List[dict])
 async def get_chat_history(
     chat_type: Optional[str] = None,
     limit: int = 50,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get chat history."""
     user_id = current_user.get("id")
@@ -293,6 +608,6 @@ async def clear_chat_history(
         query = query.where(ChatHistory.chat_type == chat_type)
     
     await db.execute(query)
-    await db.commit()
+    on_commit(db, lambda: conversations.forget(user_id))
     
     return {"message": "Chat history cleared"}
@@ -2,19 +2,99 @@
 Health data endpoints (steps, water intake, etc.)
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
-from datetime import datetime, date
+from sqlalchemy import select, func, case, literal, or_, Date
+from typing import Annotated, AsyncIterator, List, Optional
+from collections import Counter
+from datetime import datetime, date, timedelta
 from uuid import UUID as PyUUID
+import base64
+import time
+import numpy as np
 
-from app.core.database import get_db
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, execute_write, on_commit, upsert_insert, UnitOfWorkRoute
 from app.core.security import get_current_user
-from app.models.medical import DailyHealth
-from pydantic import BaseModel
+from app.core.streaming import is_ndjson, iter_ndjson, read_json
+from app.models.medical import DailyHealth, HealthRollup, HealthSample, HealthStreak, SampleMetric, SleepStage
+from pydantic import BaseModel, Field
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Records validated and written together in /sync
+SYNC_CHUNK_SIZE = 500
+
+# Oldest day (relative to today) a sync may backfill
+SYNC_MAX_DAYS_BACK = 366
+
+# Metrics a sync may set: (min, max, whole numbers only)
+SYNC_METRICS = {
+    "steps": (0, 200000, True),
+    "steps_goal": (0, 200000, True),
+    "water_intake": (0, 100, True),
+    "water_goal": (0, 100, True),
+    "sleep_hours": (0, 24, False),
+    "weight": (1, 500, False),
+}
+_SYNC_METRIC_NAMES = list(SYNC_METRICS)
+_SYNC_METRIC_CODES = {name: code for code, name in enumerate(_SYNC_METRIC_NAMES)}
+_SYNC_MIN = np.array([low for low, _, _ in SYNC_METRICS.values()], dtype=float)
+_SYNC_MAX = np.array([high for _, high, _ in SYNC_METRICS.values()], dtype=float)
+_SYNC_WHOLE = np.array([whole for _, _, whole in SYNC_METRICS.values()], dtype=bool)
+
+# Intraday samples: oldest storable sample, most points a range query
+# may return and most samples per POSTed batch (a week of minutes)
+SAMPLE_MAX_AGE_SECONDS = 366 * 86400
+SAMPLE_MAX_POINTS = 5000
+SAMPLE_MAX_BATCH = 7 * 1440
+
+# Largest magnitude of a sample timestamp, value or duration (JavaScript's
+# safe integers); anything bigger is rejected before numpy or the database
+# can overflow on it
+SAMPLE_INT_LIMIT = 2 ** 53 - 1
+SampleInt = Annotated[int, Field(ge=-SAMPLE_INT_LIMIT, le=SAMPLE_INT_LIMIT)]
+
+# Allowed value per sample, by metric
+SAMPLE_VALUE_RANGE = {
+    SampleMetric.steps: (0, 100000),
+    SampleMetric.sleep_stage: (SleepStage.awake.value, SleepStage.rem.value),
+}
+
+# Downsampling bucket sizes in seconds (raw returns samples as stored)
+SAMPLE_BUCKETS = {"raw": None, "hour": 3600, "day": 86400}
+
+# /history: columns a client may select, those returned by default, and
+# rows per page
+HISTORY_FIELDS = (
+    "date", "steps", "steps_goal", "water_intake", "water_goal",
+    "sleep_hours", "weight", "mood", "notes"
+)
+HISTORY_DEFAULT_FIELDS = HISTORY_FIELDS[:7]
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Rollup periods, and how many of each /rollups may return
+ROLLUP_PERIODS = ("week", "month")
+ROLLUP_MAX_COUNT = 104
+
+# /insights: longest lookback, largest rolling window, and the z-score
+# beyond which a day is flagged
+INSIGHTS_MAX_DAYS = 730
+INSIGHTS_MAX_WINDOW = 60
+INSIGHTS_Z_THRESHOLD = 2.5
+INSIGHTS_METRICS = ("steps", "water_intake", "sleep_hours", "weight")
+INSIGHTS_ANOMALY_METRICS = ("steps", "sleep_hours")
+
+# Insights cached per user (oldest dropped beyond this many ranges/windows)
+INSIGHTS_MAX_PER_USER = 8
+
+# user id -> {(today, days, window): insights}; a health write drops the user's dict
+insights_cache = TTLCache(
+    maxsize=settings.INSIGHTS_CACHE_MAX_SIZE,
+    ttl=settings.INSIGHTS_CACHE_TTL_SECONDS
+)
 
 
 # ==================== Schemas ====================
@@ -35,12 +115,471 @@ class StepsUpdate(BaseModel):
     """Schema for updating steps."""
     steps: int
     date: Optional[str] = None
+    increment: bool = False  # Add to the day's count (pedometer deltas)
 
 
 class WaterUpdate(BaseModel):
     """Schema for updating water intake."""
     glasses: int
     date: Optional[str] = None
+    increment: bool = False  # Add to the day's count
+
+
+class SampleBatch(BaseModel):
+    """Columnar batch of intraday samples for one metric.
+    
+    Timestamps are either listed in ``ts`` (epoch seconds, one per value) or
+    evenly spaced from ``start`` every ``interval`` seconds. Each sample
+    covers ``durations[i]`` seconds, ``interval`` by default.
+    """
+    metric: str  # steps, sleep_stage
+    values: List[SampleInt] = Field(..., max_length=SAMPLE_MAX_BATCH)
+    ts: Optional[List[SampleInt]] = Field(None, max_length=SAMPLE_MAX_BATCH)
+    start: Optional[SampleInt] = None
+    interval: int = Field(60, gt=0, le=86400)
+    durations: Optional[List[SampleInt]] = Field(None, max_length=SAMPLE_MAX_BATCH)
+
+
+# ==================== Helpers ====================
+
+def parse_day(value: Optional[str]) -> date:
+    """Parse a YYYY-MM-DD string, defaulting to today (UTC)."""
+    if value:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return datetime.utcnow().date()
+
+
+async def upsert_daily_health(
+    db: AsyncSession,
+    user_id: PyUUID,
+    day: date,
+    values: Optional[dict] = None,
+    increments: Optional[dict] = None
+):
+    """Create or update a user's row for a day in one INSERT ... ON CONFLICT.
+    
+    ``values`` overwrite columns and ``increments`` are added to the stored
+    value (a new row starts from 0). Columns not given keep their current
+    value, or the column default on insert. The day's rollups and the
+    user's streak are refreshed in the same transaction, and cached
+    insights dropped once it commits. Returns the resulting row.
+    """
+    values = values or {}
+    increments = increments or {}
+    table = DailyHealth.__table__
+    
+    insert = upsert_insert(db, table).values(user_id=user_id, date=day, **values, **increments)
+    set_ = {name: insert.excluded[name] for name in values}
+    set_.update({
+        name: func.coalesce(table.c[name], 0) + insert.excluded[name]
+        for name in increments
+    })
+    set_["updated_at"] = func.now()
+    
+    result = await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_=set_
+        ).returning(*table.c)
+    )
+    row = result.one()
+    await refresh_health_summaries(db, user_id, [row])
+    return row
+
+
+async def upsert_daily_health_rows(db: AsyncSession, user_id: PyUUID, rows: dict) -> None:
+    """Upsert several days at once from {day: {column: value}}.
+    
+    Days are grouped by the set of columns they carry and each group is
+    written with one multi-row INSERT ... ON CONFLICT that overwrites only
+    those columns. Rollups and the streak are refreshed once at the end.
+    """
+    table = DailyHealth.__table__
+    written = []
+    groups: dict = {}
+    for day, values in rows.items():
+        groups.setdefault(tuple(sorted(values)), []).append(
+            {"user_id": user_id, "date": day, **values}
+        )
+    
+    for columns, group in groups.items():
+        insert = upsert_insert(db, table).values(group)
+        set_ = {name: insert.excluded[name] for name in columns}
+        set_["updated_at"] = func.now()
+        result = await db.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.date],
+                set_=set_
+            ).returning(table.c.date, table.c.steps, table.c.steps_goal)
+        )
+        written.extend(result.all())
+    
+    await refresh_health_summaries(db, user_id, written)
+
+
+def encode_history_cursor(day: date, row_id: PyUUID) -> str:
+    """Opaque cursor for the history row after which the next page starts."""
+    return base64.urlsafe_b64encode(f"{day.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple:
+    """Inverse of encode_history_cursor; 400 if the cursor wasn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, row_id = raw.split("|")
+        return date.fromisoformat(day), PyUUID(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def period_bounds(period: str, day: date) -> tuple:
+    """First and last day of the week (Monday to Sunday) or month holding ``day``."""
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def goal_met(value, goal):
+    """Whether a daily value met its (non-zero) goal.
+    
+    Works on plain numbers and on columns, where it builds the SQL condition.
+    """
+    return (goal > 0) & (value >= goal)
+
+
+async def refresh_rollups(db: AsyncSession, user_id: PyUUID, days) -> None:
+    """Recompute the week and month rollups holding each of ``days``.
+    
+    Each period is rebuilt from its (at most 31) daily_health rows with one
+    INSERT ... SELECT ... ON CONFLICT, so rollups can't drift from the rows
+    they summarize whatever mix of overwrites and increments produced them.
+    """
+    daily = DailyHealth.__table__
+    table = HealthRollup.__table__
+    periods = sorted({
+        (period, *period_bounds(period, day))
+        for day in days
+        for period in ROLLUP_PERIODS
+    })
+    
+    columns = [
+        "user_id", "period", "period_start", "days_logged", "steps_total",
+        "steps_goal_days", "water_total", "water_goal_days",
+        "sleep_hours_avg", "weight_avg", "updated_at"
+    ]
+    
+    for period, start, end in periods:
+        summary = select(
+            literal(user_id, daily.c.user_id.type),
+            literal(period),
+            literal(start, Date()),
+            func.count(),
+            func.coalesce(func.sum(daily.c.steps), 0),
+            func.coalesce(func.sum(case(
+                (goal_met(daily.c.steps, daily.c.steps_goal), 1), else_=0
+            )), 0),
+            func.coalesce(func.sum(daily.c.water_intake), 0),
+            func.coalesce(func.sum(case(
+                (goal_met(daily.c.water_intake, daily.c.water_goal), 1), else_=0
+            )), 0),
+            func.avg(daily.c.sleep_hours),
+            func.avg(daily.c.weight),
+            func.now()
+        ).where(
+            daily.c.user_id == user_id,
+            daily.c.date >= start,
+            daily.c.date <= end
+        )
+        insert = upsert_insert(db, table).from_select(columns, summary)
+        await db.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.period, table.c.period_start],
+                set_={name: insert.excluded[name] for name in columns[3:]}
+            )
+        )
+
+
+def _streak_runs(days: List[date]) -> tuple:
+    """Return (last run length, longest run length) for sorted, distinct days."""
+    if not days:
+        return 0, 0
+    ordinals = np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days))
+    # Run boundaries are where consecutive goal days are more than a day apart
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ordinals) != 1) + 1))
+    lengths = np.diff(np.append(starts, len(ordinals)))
+    return int(lengths[-1]), int(lengths.max())
+
+
+async def refresh_health_summaries(db: AsyncSession, user_id: PyUUID, rows) -> None:
+    """Bring a user's rollups and streak up to date after daily_health writes.
+    
+    ``rows`` are the written (date, steps, steps_goal) rows. The user's
+    streak row is upserted first, which locks it until commit on
+    PostgreSQL: concurrent writes for the same user then recompute one
+    after the other and each sees the other's committed days (SQLite
+    already has a single writer).
+    
+    The streak is advanced in place when the written days come after the
+    last goal day, or are that day and still meet the goal (the usual case:
+    today's steps going up). Anything else, like a backfill or a day
+    dropping below its goal, recounts it from the user's goal days.
+    """
+    if not rows:
+        return
+    on_commit(db, lambda: insights_cache.pop(str(user_id)))
+    table = HealthStreak.__table__
+    insert = upsert_insert(db, table).values(user_id=user_id)
+    result = await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"updated_at": func.now()}
+        ).returning(*table.c)
+    )
+    streak = result.one()
+    
+    await refresh_rollups(db, user_id, {row.date for row in rows})
+    
+    current, longest, last_day = streak.current_streak, streak.longest_streak, streak.last_goal_day
+    if last_day is None or all(
+        row.date > last_day or (row.date == last_day and goal_met(row.steps, row.steps_goal))
+        for row in rows
+    ):
+        for row in sorted(rows, key=lambda row: row.date):
+            if (last_day is not None and row.date <= last_day) or not goal_met(row.steps, row.steps_goal):
+                continue
+            if last_day is not None and row.date == last_day + timedelta(days=1):
+                current += 1
+            else:
+                current = 1
+            last_day = row.date
+            longest = max(longest, current)
+    else:
+        result = await db.execute(
+            select(DailyHealth.date)
+            .where(
+                DailyHealth.user_id == user_id,
+                goal_met(DailyHealth.steps, DailyHealth.steps_goal)
+            )
+            .order_by(DailyHealth.date)
+        )
+        goal_days = result.scalars().all()
+        current, longest = _streak_runs(goal_days)
+        last_day = goal_days[-1] if goal_days else None
+    
+    if (current, longest, last_day) != (streak.current_streak, streak.longest_streak, streak.last_goal_day):
+        await db.execute(
+            table.update()
+            .where(table.c.user_id == user_id)
+            .values(current_streak=current, longest_streak=longest, last_goal_day=last_day)
+        )
+
+
+def _float_list(values: np.ndarray, decimals: int = 2) -> list:
+    """JSON-ready list of floats, with None for NaN."""
+    return [None if value != value else value for value in np.round(values, decimals).tolist()]
+
+
+def compute_health_insights(rows: list, start: date, days: int, window: int) -> dict:
+    """Rolling means, trends, anomalies and goal adherence for daily rows.
+    
+    ``rows`` are (date, steps, steps_goal, water_intake, water_goal,
+    sleep_hours, weight) tuples from ``start`` on. They are laid out on a
+    (metric x day) grid with NaN for days that weren't logged, and every
+    statistic is computed for all metrics at once on that grid. Zero steps
+    or water counts as not logged, since rows are created by whichever
+    metric is written first.
+    """
+    dates, steps, steps_goal, water, water_goal, sleep, weight = (
+        zip(*rows) if rows else ((),) * 7
+    )
+    index = np.fromiter((day.toordinal() for day in dates), dtype=np.int64, count=len(rows)) - start.toordinal()
+    
+    grid = np.full((len(INSIGHTS_METRICS), days), np.nan)
+    if rows:
+        values = np.array([steps, water, sleep, weight], dtype=float)
+        counts = values[:2]
+        counts[counts == 0] = np.nan
+        grid[:, index] = values
+    logged = np.isfinite(grid)
+    filled = np.where(logged, grid, 0.0)
+    
+    # Rolling mean over the trailing window of calendar days, from prefix sums
+    day = np.arange(days)
+    low = np.maximum(day - window + 1, 0)
+    sums = np.concatenate((np.zeros((len(grid), 1)), filled.cumsum(axis=1)), axis=1)
+    seen = np.concatenate((np.zeros((len(grid), 1)), logged.cumsum(axis=1)), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling = (sums[:, day + 1] - sums[:, low]) / (seen[:, day + 1] - seen[:, low])
+        
+        # Mean, spread and least-squares slope (per day) over logged days
+        count = logged.sum(axis=1)
+        mean = filled.sum(axis=1) / count
+        day_mean = (logged * day).sum(axis=1) / count
+        dx = np.where(logged, day - day_mean[:, None], 0.0)
+        dy = np.where(logged, grid - mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        std = np.sqrt((dy * dy).sum(axis=1) / count)
+        z = dy / std[:, None]
+    slope[count < 2] = np.nan
+    
+    day_strings = [str(start + timedelta(days=offset)) for offset in range(days)]
+    metrics = {}
+    for i, name in enumerate(INSIGHTS_METRICS):
+        metrics[name] = {
+            "days_logged": int(count[i]),
+            "mean": _float_list(mean[i:i + 1])[0],
+            "std": _float_list(std[i:i + 1])[0],
+            "trend_per_week": _float_list(slope[i:i + 1] * 7)[0],
+            "rolling_mean": _float_list(rolling[i])
+        }
+    
+    anomalies = []
+    for name in INSIGHTS_ANOMALY_METRICS:
+        i = INSIGHTS_METRICS.index(name)
+        with np.errstate(invalid="ignore"):
+            flagged = np.flatnonzero(logged[i] & (np.abs(z[i]) >= INSIGHTS_Z_THRESHOLD))
+        anomalies.extend(
+            {
+                "date": day_strings[position],
+                "metric": name,
+                "value": grid[i, position].item(),
+                "z": round(z[i, position].item(), 2)
+            }
+            for position in flagged
+        )
+    anomalies.sort(key=lambda anomaly: anomaly["date"])
+    
+    goals = {}
+    recent = index >= days - 7
+    for name, actual, target in (("steps", steps, steps_goal), ("water", water, water_goal)):
+        actual = np.array(actual, dtype=float)
+        target = np.array(target, dtype=float)
+        tracked = actual > 0
+        met = tracked & goal_met(actual, target)
+        goals[name] = {
+            "days_logged": int(tracked.sum()),
+            "days_met": int(met.sum()),
+            "adherence": round(met.sum() / tracked.sum(), 3) if tracked.any() else None,
+            "last_7_days": int(met[recent].sum())
+        }
+    
+    return {
+        "start": day_strings[0],
+        "end": day_strings[-1],
+        "window": window,
+        "dates": day_strings,
+        "metrics": metrics,
+        "anomalies": anomalies,
+        "goals": goals
+    }
+
+
+def _parse_sync_days(values: list) -> np.ndarray:
+    """Parse YYYY-MM-DD strings into datetime64[D], NaT where malformed."""
+    strings = np.array([
+        value if isinstance(value, str) and len(value) == 10 else "NaT"
+        for value in values
+    ])
+    try:
+        return strings.astype("datetime64[D]")
+    except ValueError:
+        # At least one bad date: parse one by one to find it
+        days = np.full(len(strings), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, value in enumerate(strings):
+            try:
+                days[i] = np.datetime64(value, "D")
+            except ValueError:
+                pass
+        return days
+
+
+def validate_sync_records(records: list, today: date) -> tuple:
+    """Validate and dedupe sync records in one vectorized pass.
+    
+    Returns a status per record ("ok", "duplicate", "invalid_record",
+    "invalid_date", "invalid_metric" or "invalid_value") and the values to write as
+    {day: {metric: value}}. A later record for the same day and metric
+    supersedes an earlier one, which is reported as "duplicate".
+    """
+    count = len(records)
+    fields = [
+        (record.get("date"), record.get("metric"), record.get("value"))
+        if isinstance(record, dict) else (None, None, None)
+        for record in records
+    ]
+    days = _parse_sync_days([day for day, _, _ in fields])
+    codes = np.fromiter(
+        (_SYNC_METRIC_CODES.get(metric, -1) if isinstance(metric, str) else -1 for _, metric, _ in fields),
+        dtype=np.int64,
+        count=count
+    )
+    values = np.fromiter(
+        (
+            float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+            for _, _, value in fields
+        ),
+        dtype=float,
+        count=count
+    )
+    
+    is_record = np.fromiter((isinstance(record, dict) for record in records), dtype=bool, count=count)
+    
+    today64 = np.datetime64(today, "D")
+    known = np.where(codes >= 0, codes, 0)
+    bad_date = np.isnat(days) | (days < today64 - SYNC_MAX_DAYS_BACK) | (days > today64 + 1)
+    bad_metric = codes < 0
+    with np.errstate(invalid="ignore"):
+        bad_value = (
+            ~np.isfinite(values)
+            | (values < _SYNC_MIN[known])
+            | (values > _SYNC_MAX[known])
+            | (_SYNC_WHOLE[known] & (values != np.floor(values)))
+        )
+    
+    statuses = np.select(
+        [~is_record, bad_date, bad_metric, bad_value],
+        ["invalid_record", "invalid_date", "invalid_metric", "invalid_value"],
+        default="ok"
+    ).astype(object)
+    
+    # Keep the last valid record for each (day, metric)
+    valid = np.flatnonzero(statuses == "ok")
+    keys = days[valid].astype(np.int64) * len(_SYNC_METRIC_NAMES) + codes[valid]
+    _, last = np.unique(keys[::-1], return_index=True)
+    winners = np.sort(valid[::-1][last])
+    statuses[np.setdiff1d(valid, winners)] = "duplicate"
+    
+    rows: dict = {}
+    for i in winners:
+        metric = _SYNC_METRIC_NAMES[codes[i]]
+        value = values[i]
+        rows.setdefault(days[i].item(), {})[metric] = int(value) if SYNC_METRICS[metric][2] else float(value)
+    return statuses.tolist(), rows
+
+
+async def _iter_health_records(request: Request) -> AsyncIterator[dict]:
+    """Yield sync records from a JSON body or an NDJSON stream."""
+    if is_ndjson(request):
+        async for record in iter_ndjson(request):
+            yield record
+        return
+    
+    body = await read_json(request)
+    if isinstance(body, dict):
+        body = body.get("records")
+    if not isinstance(body, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array of records or NDJSON"
+        )
+    for item in body:
+        yield item
 
 
 # ==================== Endpoints ====================
@@ -49,20 +588,17 @@ class WaterUpdate(BaseModel):
 async def get_daily_health(
     date_str: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get daily health data for a specific date or today."""
     user_id = current_user.get("id")
     
-    if date_str:
-        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    else:
-        target_date = date.today()
+    target_date = parse_day(date_str)
     
     result = await db.execute(
         select(DailyHealth).where(
             DailyHealth.user_id == PyUUID(user_id),
-            func.date(DailyHealth.date) == target_date
+            DailyHealth.date == target_date
         )
     )
     health = result.scalar_one_or_none()
@@ -100,52 +636,13 @@ async def update_daily_health(
 ):
     """Update daily health data."""
     user_id = PyUUID(current_user.get("id"))
+    target_date = parse_day(data.date)
+    values = data.model_dump(exclude={"date"}, exclude_none=True)
     
-    if data.date:
-        target_date = datetime.strptime(data.date, "%Y-%m-%d")
-    else:
-        target_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    result = await db.execute(
-        select(DailyHealth).where(
-            DailyHealth.user_id == user_id,
-            func.date(DailyHealth.date) == target_date.date()
-        )
+    await execute_write(
+        db,
+        lambda session: upsert_daily_health(session, user_id, target_date, values=values)
     )
-    health = result.scalar_one_or_none()
-    
-    if health:
-        # Update existing
-        if data.steps is not None:
-            health.steps = data.steps
-        if data.steps_goal is not None:
-            health.steps_goal = data.steps_goal
-        if data.water_intake is not None:
-            health.water_intake = data.water_intake
-        if data.water_goal is not None:
-            health.water_goal = data.water_goal
-        if data.sleep_hours is not None:
-            health.sleep_hours = data.sleep_hours
-        if data.weight is not None:
-            health.weight = data.weight
-        if data.notes is not None:
-            health.notes = data.notes
-    else:
-        # Create new
-        health = DailyHealth(
-            user_id=user_id,
-            date=target_date,
-            steps=data.steps or 0,
-            steps_goal=data.steps_goal or 10000,
-            water_intake=data.water_intake or 0,
-            water_goal=data.water_goal or 8,
-            sleep_hours=data.sleep_hours or 0,
-            weight=data.weight,
-            notes=data.notes
-        )
-        db.add(health)
-    
-    await db.commit()
     
     return {"message": "Daily health updated"}
 
@@ -156,35 +653,18 @@ async def update_steps(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update step count."""
+    """Update step count, or add to it when ``increment`` is set."""
     user_id = PyUUID(current_user.get("id"))
+    target_date = parse_day(data.date)
+    change = {"steps": data.steps}
+    values, increments = (None, change) if data.increment else (change, None)
     
-    if data.date:
-        target_date = datetime.strptime(data.date, "%Y-%m-%d")
-    else:
-        target_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    result = await db.execute(
-        select(DailyHealth).where(
-            DailyHealth.user_id == user_id,
-            func.date(DailyHealth.date) == target_date.date()
-        )
+    row = await execute_write(
+        db,
+        lambda session: upsert_daily_health(session, user_id, target_date, values, increments)
     )
-    health = result.scalar_one_or_none()
-    
-    if health:
-        health.steps = data.steps
-    else:
-        health = DailyHealth(
-            user_id=user_id,
-            date=target_date,
-            steps=data.steps
-        )
-        db.add(health)
-    
-    await db.commit()
     
-    return {"message": "Steps updated", "steps": data.steps}
+    return {"message": "Steps updated", "steps": row.steps}
 
 
 @router.post("/water")
@@ -193,69 +673,470 @@ async def update_water_intake(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update water intake."""
+    """Update water intake, or add to it when ``increment`` is set."""
     user_id = PyUUID(current_user.get("id"))
+    target_date = parse_day(data.date)
+    change = {"water_intake": data.glasses}
+    values, increments = (None, change) if data.increment else (change, None)
     
-    if data.date:
-        target_date = datetime.strptime(data.date, "%Y-%m-%d")
-    else:
-        target_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    row = await execute_write(
+        db,
+        lambda session: upsert_daily_health(session, user_id, target_date, values, increments)
+    )
+    
+    return {"message": "Water intake updated", "glasses": row.water_intake}
+
+
+@router.get("/history")
+async def get_health_history(
+    response: Response,
+    days: int = 7,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get health history, newest first, one page at a time.
+    
+    The range is ``from``/``to`` (YYYY-MM-DD, inclusive), or the past
+    ``days`` days when ``from`` isn't given. ``fields`` is a comma-separated
+    subset of the columns to return (``date`` is always included). Pages
+    hold at most HISTORY_MAX_PAGE_SIZE rows; when there are more, the
+    X-Next-Cursor header holds the cursor for the next page.
+    """
+    user_id = current_user.get("id")
+    
+    try:
+        start_date = parse_day(from_date) if from_date else datetime.utcnow().date() - timedelta(days=days)
+        end_date = parse_day(to_date) if to_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from and to must be YYYY-MM-DD dates"
+        )
+    
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else HISTORY_DEFAULT_FIELDS
+    unknown = set(names) - set(HISTORY_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    names = ["date"] + [name for name in dict.fromkeys(names) if name != "date"]
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    
+    query = select(
+        DailyHealth.id,
+        *[DailyHealth.__table__.c[name] for name in names]
+    ).where(
+        DailyHealth.user_id == PyUUID(user_id),
+        DailyHealth.date >= start_date
+    )
+    if end_date is not None:
+        query = query.where(DailyHealth.date <= end_date)
+    if cursor:
+        after_date, after_id = decode_history_cursor(cursor)
+        query = query.where(or_(
+            DailyHealth.date < after_date,
+            (DailyHealth.date == after_date) & (DailyHealth.id < after_id)
+        ))
     
     result = await db.execute(
-        select(DailyHealth).where(
-            DailyHealth.user_id == user_id,
-            func.date(DailyHealth.date) == target_date.date()
+        query.order_by(DailyHealth.date.desc(), DailyHealth.id.desc()).limit(limit + 1)
+    )
+    rows = result.all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_history_cursor(rows[-1].date, rows[-1].id)
+    
+    return [
+        {name: str(value) if name == "date" else value for name, value in zip(names, row[1:])}
+        for row in rows
+    ]
+
+
+def _rollup_response(period: str, start: date, rollup: Optional[HealthRollup]) -> dict:
+    """Serialize a rollup, or an empty period when there is none."""
+    days = rollup.days_logged if rollup else 0
+    steps = rollup.steps_total if rollup else 0
+    water = rollup.water_total if rollup else 0
+    return {
+        "period": period,
+        "start": str(start),
+        "end": str(period_bounds(period, start)[1]),
+        "days_logged": days,
+        "steps_total": steps,
+        "steps_avg": round(steps / days) if days else 0,
+        "steps_goal_days": rollup.steps_goal_days if rollup else 0,
+        "water_total": water,
+        "water_avg": round(water / days, 1) if days else 0,
+        "water_goal_days": rollup.water_goal_days if rollup else 0,
+        "sleep_hours_avg": rollup.sleep_hours_avg if rollup else None,
+        "weight_avg": rollup.weight_avg if rollup else None
+    }
+
+
+@router.get("/summary")
+async def get_health_summary(
+    date_str: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Week and month totals, averages and goal days, plus the steps streak.
+    
+    Reads two rollup rows and the streak row, however long the history is.
+    """
+    user_id = PyUUID(current_user.get("id"))
+    today = parse_day(date_str)
+    starts = {period: period_bounds(period, today)[0] for period in ROLLUP_PERIODS}
+    
+    result = await db.execute(
+        select(HealthRollup).where(
+            HealthRollup.user_id == user_id,
+            HealthRollup.period.in_(ROLLUP_PERIODS),
+            HealthRollup.period_start.in_(list(starts.values()))
         )
     )
-    health = result.scalar_one_or_none()
+    rollups = {
+        rollup.period: rollup
+        for rollup in result.scalars().all()
+        if rollup.period_start == starts[rollup.period]
+    }
     
-    if health:
-        health.water_intake = data.glasses
-    else:
-        health = DailyHealth(
-            user_id=user_id,
-            date=target_date,
-            water_intake=data.glasses
+    result = await db.execute(select(HealthStreak).where(HealthStreak.user_id == user_id))
+    streak = result.scalar_one_or_none()
+    last_day = streak.last_goal_day if streak else None
+    # A streak is current until a whole day passes without meeting the goal
+    is_current = last_day is not None and last_day >= today - timedelta(days=1)
+    
+    return {
+        "date": str(today),
+        **{period: _rollup_response(period, start, rollups.get(period)) for period, start in starts.items()},
+        "streak": {
+            "current": streak.current_streak if is_current else 0,
+            "longest": streak.longest_streak if streak else 0,
+            "last_goal_day": str(last_day) if last_day else None
+        }
+    }
+
+
+@router.get("/rollups")
+async def get_health_rollups(
+    period: str = "week",
+    count: int = 12,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The last ``count`` weeks or months, newest first.
+    
+    Periods without any logged days are included with zero totals so charts
+    get an unbroken series.
+    """
+    user_id = PyUUID(current_user.get("id"))
+    if period not in ROLLUP_PERIODS or not 1 <= count <= ROLLUP_MAX_COUNT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"period must be one of: {', '.join(ROLLUP_PERIODS)}; count 1-{ROLLUP_MAX_COUNT}"
         )
-        db.add(health)
     
-    await db.commit()
+    starts = [period_bounds(period, datetime.utcnow().date())[0]]
+    while len(starts) < count:
+        starts.append(period_bounds(period, starts[-1] - timedelta(days=1))[0])
     
-    return {"message": "Water intake updated", "glasses": data.glasses}
+    result = await db.execute(
+        select(HealthRollup)
+        .where(
+            HealthRollup.user_id == user_id,
+            HealthRollup.period == period,
+            HealthRollup.period_start >= starts[-1]
+        )
+    )
+    rollups = {rollup.period_start: rollup for rollup in result.scalars().all()}
+    
+    return [_rollup_response(period, start, rollups.get(start)) for start in starts]
 
 
-@router.get("/history")
-async def get_health_history(
-    days: int = 7,
+@router.get("/insights")
+async def get_health_insights(
+    days: int = 90,
+    window: int = 7,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get health history for the past N days."""
-    user_id = current_user.get("id")
+    """Trends over the last ``days`` days (today included).
     
-    from datetime import timedelta
+    Per metric: mean, spread, trend per week and a ``window``-day rolling
+    mean lined up with ``dates``; days whose steps or sleep are unusually
+    far from the mean; and steps/water goal adherence. Computed from one
+    query and cached until the user's next health write.
+    """
+    user_id = current_user.get("id")
+    if not 1 <= days <= INSIGHTS_MAX_DAYS or not 2 <= window <= INSIGHTS_MAX_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be 1-{INSIGHTS_MAX_DAYS} and window 2-{INSIGHTS_MAX_WINDOW}"
+        )
     
-    start_date = datetime.utcnow() - timedelta(days=days)
+    today = datetime.utcnow().date()
+    key = (today, days, window)
+    # Looked up before the query: if a write commits meanwhile, it drops this
+    # dict and the result below is stored where nobody will find it
+    cached = insights_cache.get(user_id)
+    if cached is None:
+        cached = {}
+        insights_cache.set(user_id, cached)
+    elif key in cached:
+        return cached[key]
     
+    start = today - timedelta(days=days - 1)
     result = await db.execute(
-        select(DailyHealth)
+        select(
+            DailyHealth.date,
+            DailyHealth.steps,
+            DailyHealth.steps_goal,
+            DailyHealth.water_intake,
+            DailyHealth.water_goal,
+            DailyHealth.sleep_hours,
+            DailyHealth.weight
+        )
         .where(
             DailyHealth.user_id == PyUUID(user_id),
-            DailyHealth.date >= start_date
+            DailyHealth.date >= start,
+            DailyHealth.date <= today
         )
-        .order_by(DailyHealth.date.desc())
     )
-    history = result.scalars().all()
+    insights = compute_health_insights(result.all(), start, days, window)
+    while len(cached) >= INSIGHTS_MAX_PER_USER:
+        del cached[next(iter(cached))]
+    cached[key] = insights
+    return insights
+
+
+@router.post("/sync")
+async def sync_health(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Apply a batch of {"date", "metric", "value"} records from a device.
     
-    return [
-        {
-            "date": str(h.date.date()),
-            "steps": h.steps,
-            "steps_goal": h.steps_goal,
-            "water_intake": h.water_intake,
-            "water_goal": h.water_goal,
-            "sleep_hours": h.sleep_hours,
-            "weight": h.weight
-        }
-        for h in history
+    Accepts {"records": [...]} or a JSON array, or an NDJSON stream with
+    Content-Type application/x-ndjson for large backfills; either may be
+    gzipped (Content-Encoding: gzip). Records are validated and deduped in
+    chunks and each chunk is written with one multi-row upsert per set of
+    metrics. Values replace what is stored for that day.
+    
+    ``results`` holds one status per record, in request order.
+    """
+    user_id = PyUUID(current_user.get("id"))
+    today = datetime.utcnow().date()
+    results: List[str] = []
+    chunk: List[dict] = []
+    
+    async def flush() -> None:
+        statuses, rows = validate_sync_records(chunk, today)
+        if rows:
+            await execute_write(
+                db,
+                lambda session: upsert_daily_health_rows(session, user_id, rows)
+            )
+        results.extend(statuses)
+        chunk.clear()
+    
+    async for record in _iter_health_records(request):
+        chunk.append(record)
+        if len(chunk) >= SYNC_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+    
+    counts = Counter(results)
+    return {
+        "received": len(results),
+        "applied": counts["ok"],
+        "duplicates": counts["duplicate"],
+        "invalid": len(results) - counts["ok"] - counts["duplicate"],
+        "results": results
+    }
+
+
+# ==================== Intraday samples ====================
+
+def _sample_metric(name: str) -> SampleMetric:
+    try:
+        return SampleMetric[name]
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metric '{name}'; expected one of: {', '.join(m.name for m in SampleMetric)}"
+        )
+
+
+async def store_samples(db: AsyncSession, rows: List[dict]) -> None:
+    """Upsert sample rows; a repeated timestamp replaces the stored sample.
+    
+    Runs as one executemany of a single cached statement, which is much
+    cheaper than compiling a large multi-row VALUES clause per batch.
+    """
+    table = HealthSample.__table__
+    insert = upsert_insert(db, table)
+    await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.metric, table.c.ts],
+            set_={"value": insert.excluded.value, "duration": insert.excluded.duration}
+        ),
+        rows
+    )
+
+
+@router.post("/samples")
+async def ingest_samples(
+    batch: SampleBatch,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Store a batch of intraday samples (minute step counts, sleep stages).
+    
+    Samples with a timestamp, value or duration out of range are dropped
+    (numbers beyond SAMPLE_INT_LIMIT reject the batch with 422); within a
+    batch the last sample for a timestamp wins.
+    """
+    user_id = PyUUID(current_user.get("id"))
+    metric = _sample_metric(batch.metric)
+    count = len(batch.values)
+    
+    if batch.ts is not None:
+        ts = np.asarray(batch.ts, dtype=np.int64)
+    elif batch.start is not None:
+        ts = batch.start + batch.interval * np.arange(count, dtype=np.int64)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either ts or start is required"
+        )
+    if batch.durations is not None:
+        durations = np.asarray(batch.durations, dtype=np.int64)
+    else:
+        durations = np.full(count, batch.interval, dtype=np.int64)
+    if len(ts) != count or len(durations) != count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ts, values and durations must have the same length"
+        )
+    values = np.asarray(batch.values, dtype=np.int64)
+    
+    now = int(time.time())
+    low, high = SAMPLE_VALUE_RANGE[metric]
+    valid = np.flatnonzero(
+        (ts >= now - SAMPLE_MAX_AGE_SECONDS) & (ts <= now + 86400)
+        & (values >= low) & (values <= high)
+        & (durations > 0) & (durations <= 86400)
+    )
+    _, last = np.unique(ts[valid][::-1], return_index=True)
+    keep = np.sort(valid[::-1][last])
+    
+    rows = [
+        {"user_id": user_id, "metric": metric.value, "ts": t, "value": v, "duration": d}
+        for t, v, d in zip(ts[keep].tolist(), values[keep].tolist(), durations[keep].tolist())
     ]
+    if rows:
+        await execute_write(db, lambda session: store_samples(session, rows))
+    
+    return {
+        "received": count,
+        "stored": len(rows),
+        "duplicates": len(valid) - len(keep),
+        "invalid": count - len(valid)
+    }
+
+
+@router.get("/samples")
+async def get_samples(
+    metric: str,
+    start: int = Query(..., ge=0, le=SAMPLE_INT_LIMIT),
+    end: Optional[int] = Query(None, ge=0, le=SAMPLE_INT_LIMIT),
+    bucket: str = "hour",
+    tz_offset_minutes: int = Query(0, ge=-24 * 60, le=24 * 60),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Intraday samples in [start, end) (epoch seconds), downsampled in SQL.
+    
+    ``bucket`` is raw, hour or day; buckets are aligned to local time using
+    ``tz_offset_minutes``. Steps are summed per bucket and sleep stages are
+    reported as seconds per stage. The response is columnar: ``ts`` holds
+    bucket starts and the other lists line up with it.
+    """
+    user_id = PyUUID(current_user.get("id"))
+    sample_metric = _sample_metric(metric)
+    if bucket not in SAMPLE_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of: {', '.join(SAMPLE_BUCKETS)}"
+        )
+    end = end if end is not None else int(time.time())
+    size = SAMPLE_BUCKETS[bucket]
+    if end <= start or (size and (end - start) // size > SAMPLE_MAX_POINTS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid range, or more than {SAMPLE_MAX_POINTS} {bucket} buckets"
+        )
+    
+    in_range = (
+        HealthSample.user_id == user_id,
+        HealthSample.metric == sample_metric.value,
+        HealthSample.ts >= start,
+        HealthSample.ts < end
+    )
+    response = {"metric": metric, "bucket": bucket, "start": start, "end": end}
+    
+    if size is None:
+        result = await db.execute(
+            select(HealthSample.ts, HealthSample.value, HealthSample.duration)
+            .where(*in_range)
+            .order_by(HealthSample.ts)
+            .limit(SAMPLE_MAX_POINTS + 1)
+        )
+        rows = result.all()
+        response["truncated"] = len(rows) > SAMPLE_MAX_POINTS
+        rows = rows[:SAMPLE_MAX_POINTS]
+        response["ts"] = [row.ts for row in rows]
+        response["values"] = [row.value for row in rows]
+        response["durations"] = [row.duration for row in rows]
+        return response
+    
+    # Integer division buckets the (local) timestamp
+    offset = tz_offset_minutes * 60
+    bucket_start = ((HealthSample.ts + offset) // size) * size - offset
+    
+    if sample_metric == SampleMetric.steps:
+        result = await db.execute(
+            select(bucket_start, func.sum(HealthSample.value))
+            .where(*in_range)
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+        rows = result.all()
+        response["ts"] = [row[0] for row in rows]
+        response["values"] = [row[1] for row in rows]
+        return response
+    
+    result = await db.execute(
+        select(bucket_start, HealthSample.value, func.sum(HealthSample.duration))
+        .where(*in_range)
+        .group_by(bucket_start, HealthSample.value)
+        .order_by(bucket_start)
+    )
+    buckets: dict = {}
+    for bucket_ts, stage, seconds in result.all():
+        buckets.setdefault(bucket_ts, {})[stage] = seconds
+    response["ts"] = list(buckets)
+    response["seconds"] = {
+        stage.name: [by_stage.get(stage.value, 0) for by_stage in buckets.values()]
+        for stage in SleepStage
+    }
+    return response
@@ -8,7 +8,7 @@ from sqlalchemy import select, delete
 from typing import List, Optional
 from uuid import UUID
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, UnitOfWorkRoute
 from app.core.security import get_current_user
 from app.schemas.medical import (
     MedicalConditionCreate,
@@ -26,7 +26,7 @@ from app.schemas.medical import (
 )
 from app.models.medical import MedicalCondition, Allergy, SkinProblem, BasicInfo
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 # ==================== Basic Info ====================
@@ -34,7 +34,7 @@ router = APIRouter()
 @router.get("/basic-info", response_model=Optional[dict])
 async def get_basic_info(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get basic medical info."""
     user_id = current_user.get("id")
@@ -93,7 +93,6 @@ async def create_or_update_basic_info(
         )
         db.add(info)
     
-    await db.commit()
     return {"message": "Basic info saved successfully"}
 
 
@@ -102,7 +101,7 @@ async def create_or_update_basic_info(
 @router.get("/conditions", response_model=List[dict])
 async def get_conditions(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all medical conditions."""
     user_id = current_user.get("id")
@@ -141,8 +140,7 @@ async def create_condition(
     )
     
     db.add(condition)
-    await db.commit()
-    await db.refresh(condition)
+    await db.flush()
     
     return {"message": "Condition created", "id": str(condition.id)}
 
@@ -171,7 +169,6 @@ async def save_conditions_bulk(
         )
         db.add(condition)
     
-    await db.commit()
     return {"message": f"Saved {len(conditions)} conditions"}
 
 
@@ -196,7 +193,6 @@ async def delete_condition(
         raise HTTPException(status_code=404, detail="Condition not found")
     
     await db.delete(condition)
-    await db.commit()
     
     return {"message": "Condition deleted"}
 
@@ -206,7 +202,7 @@ async def delete_condition(
 @router.get("/allergies", response_model=List[dict])
 async def get_allergies(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all allergies."""
     user_id = current_user.get("id")
@@ -248,8 +244,7 @@ async def create_allergy(
     )
     
     db.add(allergy)
-    await db.commit()
-    await db.refresh(allergy)
+    await db.flush()
     
     return {"message": "Allergy created", "id": str(allergy.id)}
 
@@ -280,7 +275,6 @@ async def save_allergies_bulk(
         )
         db.add(allergy)
     
-    await db.commit()
     return {"message": f"Saved {len(allergies)} allergies"}
 
 
@@ -305,7 +299,6 @@ async def delete_allergy(
         raise HTTPException(status_code=404, detail="Allergy not found")
     
     await db.delete(allergy)
-    await db.commit()
     
     return {"message": "Allergy deleted"}
 
@@ -315,7 +308,7 @@ async def delete_allergy(
 @router.get("/skin-problems", response_model=List[dict])
 async def get_skin_problems(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all skin problems."""
     user_id = current_user.get("id")
@@ -359,8 +352,7 @@ async def create_skin_problem(
     )
     
     db.add(problem)
-    await db.commit()
-    await db.refresh(problem)
+    await db.flush()
     
     return {"message": "Skin problem created", "id": str(problem.id)}
 
@@ -392,7 +384,6 @@ async def save_skin_problems_bulk(
         )
         db.add(problem)
     
-    await db.commit()
     return {"message": f"Saved {len(problems)} skin problems"}
 
 
@@ -417,6 +408,5 @@ async def delete_skin_problem(
         raise HTTPException(status_code=404, detail="Skin problem not found")
     
     await db.delete(problem)
-    await db.commit()
     
     return {"message": "Skin problem deleted"}
@@ -6,10 +6,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import Optional
-from uuid import UUID
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.database import get_db, UnitOfWorkRoute
+from app.core.security import (
+    get_current_user,
+    get_current_db_user,
+    invalidate_cached_user
+)
 from app.schemas.user import (
     UserResponse,
     UserUpdate,
@@ -19,31 +22,20 @@ from app.schemas.user import (
 )
 from app.models.user import User, UserProfile
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 @router.get("/me", response_model=dict)
 async def get_current_user_info(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    user: Optional[User] = Depends(get_current_db_user)
 ):
     """Get current user information."""
-    user_id = current_user.get("id")
-    email = current_user.get("email")
-    
-    # Try to find user in database
-    if user_id:
-        result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    else:
-        result = await db.execute(select(User).where(User.email == email))
-    
-    user = result.scalar_one_or_none()
-    
     if not user:
         # Return basic info from token
         return {
-            "id": user_id,
-            "email": email,
+            "id": current_user.get("id"),
+            "email": current_user.get("email"),
             "is_profile_complete": False
         }
     
@@ -59,15 +51,10 @@ async def get_current_user_info(
 @router.put("/me", response_model=dict)
 async def update_current_user(
     user_data: UserUpdate,
-    current_user: dict = Depends(get_current_user),
+    user: Optional[User] = Depends(get_current_db_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update current user information."""
-    user_id = current_user.get("id")
-    
-    result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    user = result.scalar_one_or_none()
-    
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -79,28 +66,17 @@ async def update_current_user(
         setattr(user, field, value)
     
     await db.commit()
-    await db.refresh(user)
+    invalidate_cached_user(user)
     
     return {"message": "User updated successfully"}
 
 
 @router.get("/profile", response_model=Optional[dict])
 async def get_user_profile(
-    current_user: dict = Depends(get_current_user),
+    user: Optional[User] = Depends(get_current_db_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get user profile."""
-    user_id = current_user.get("id")
-    email = current_user.get("email")
-    
-    # Find user
-    if user_id:
-        user_result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    else:
-        user_result = await db.execute(select(User).where(User.email == email))
-    
-    user = user_result.scalar_one_or_none()
-    
     if not user:
         return None
     
@@ -119,6 +95,7 @@ async def get_user_profile(
         "gender": user.gender,
         "phone": user.phone,
         "address": user.address,
+        "village": user.village,
         "bloodGroup": profile.blood_group,
         "height": profile.height,
         "weight": profile.weight,
@@ -135,28 +112,19 @@ async def get_user_profile(
 async def create_or_update_profile(
     profile_data: UserProfileCreate,
     current_user: dict = Depends(get_current_user),
+    user: Optional[User] = Depends(get_current_db_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Create or update user profile."""
-    user_id = current_user.get("id")
-    email = current_user.get("email")
-    
-    # Find or create user
-    if user_id:
-        user_result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    else:
-        user_result = await db.execute(select(User).where(User.email == email))
-    
-    user = user_result.scalar_one_or_none()
-    
     if not user:
         # Create user if doesn't exist (for Supabase auth)
         user = User(
-            email=email,
+            email=current_user.get("email"),
             full_name=profile_data.full_name,
             phone=profile_data.phone,
             gender=profile_data.gender,
-            address=profile_data.address
+            address=profile_data.address,
+            village=profile_data.village
         )
         db.add(user)
         await db.flush()
@@ -166,6 +134,8 @@ async def create_or_update_profile(
         user.phone = profile_data.phone
         user.gender = profile_data.gender
         user.address = profile_data.address
+        if profile_data.village is not None:
+            user.village = profile_data.village
     
     user.is_profile_complete = True
     
@@ -203,27 +173,17 @@ async def create_or_update_profile(
         db.add(profile)
     
     await db.commit()
+    invalidate_cached_user(user)
     
     return {"message": "Profile saved successfully"}
 
 
 @router.get("/profile/complete", response_model=dict)
 async def check_profile_complete(
-    current_user: dict = Depends(get_current_user),
+    user: Optional[User] = Depends(get_current_db_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Check if user has completed their profile."""
-    user_id = current_user.get("id")
-    email = current_user.get("email")
-    
-    # Find user
-    if user_id:
-        result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    else:
-        result = await db.execute(select(User).where(User.email == email))
-    
-    user = result.scalar_one_or_none()
-    
     if not user:
         return {"is_complete": False}
     
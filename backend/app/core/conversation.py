@@ -0,0 +1,213 @@
+"""
+Conversation context for chat prompts: token counts, turn summaries and a budgeted history
+"""
+
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Sequence
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # Optional; token counts fall back to an estimate
+    tiktoken = None
+
+# Tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Conversations (chat types) cached per user; chat types are client-supplied
+MAX_CONVERSATIONS_PER_USER = 8
+
+# Longest question and answer excerpts in a turn summary, in words
+SUMMARY_QUESTION_WORDS = 25
+SUMMARY_ANSWER_WORDS = 30
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+_MARKUP = re.compile(r"[*_#>`•]+")
+_WORD = re.compile(r"[^\W\d_]{4,}")
+
+_encoding: Any = None
+
+
+def _get_encoding() -> Any:
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # The encoding file couldn't be loaded (e.g. offline)
+                print(f"⚠️  tiktoken unavailable, estimating token counts: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in ``text``: exact with tiktoken installed, else ~4 characters a token."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _clip(text: str, words: int) -> str:
+    parts = text.split()
+    return " ".join(parts[:words]) + (" …" if len(parts) > words else "")
+
+
+def summarize_turn(message: str, response: str) -> str:
+    """One-line extractive summary of an exchange.
+
+    Keeps the first sentence of the question and the answer's most
+    representative sentence: the one whose words recur most across the
+    whole answer, normalized by length so long sentences don't win by
+    size alone.
+    """
+    question = _SENTENCE_BREAK.split(_MARKUP.sub("", message).strip(), maxsplit=1)[0]
+    sentences = [s.strip() for s in _SENTENCE_BREAK.split(_MARKUP.sub("", response)) if s.strip()]
+    frequencies = Counter(word.lower() for word in _WORD.findall(response))
+
+    def score(sentence: str) -> float:
+        words = [word.lower() for word in _WORD.findall(sentence)]
+        return sum(frequencies[word] for word in words) / math.sqrt(len(words)) if words else 0.0
+
+    answer = max(sentences, key=score, default="")
+    return f"User asked: {_clip(question, SUMMARY_QUESTION_WORDS)} Answer: {_clip(answer, SUMMARY_ANSWER_WORDS)}"
+
+
+class Turn:
+    """One exchange of a conversation, with its token count and (lazily) its summary."""
+
+    __slots__ = ("id", "message", "response", "created_at", "tokens", "_summary", "_summary_tokens")
+
+    def __init__(self, id: Optional[Hashable], message: str, response: str, created_at: float):
+        self.id = id
+        self.message = message
+        self.response = response
+        self.created_at = created_at  # Epoch seconds
+        self.tokens = count_tokens(message) + count_tokens(response) + 2 * MESSAGE_OVERHEAD_TOKENS
+        self._summary: Optional[str] = None
+        self._summary_tokens = 0
+
+    def _summarize(self) -> None:
+        if self._summary is None:
+            self._summary = summarize_turn(self.message, self.response)
+            self._summary_tokens = count_tokens(self._summary) + 1  # Plus its line break
+
+    @property
+    def summary(self) -> str:
+        self._summarize()
+        return self._summary
+
+    @property
+    def summary_tokens(self) -> int:
+        self._summarize()
+        return self._summary_tokens
+
+
+def context_messages(turns: Sequence[Turn], budget: int, summary_budget: int) -> List[dict]:
+    """Chat messages carrying a conversation into the next prompt.
+
+    The most recent turns go in verbatim while they fit ``budget``
+    tokens. Older turns are replaced by their summaries, newest first,
+    within ``summary_budget`` tokens, in one system message. The result
+    never exceeds ``budget + summary_budget`` tokens.
+    """
+    verbatim: List[Turn] = []
+    used = 0
+    for turn in reversed(turns):
+        if used + turn.tokens > budget:
+            break
+        verbatim.append(turn)
+        used += turn.tokens
+    older = turns[:len(turns) - len(verbatim)]
+
+    summaries: List[str] = []
+    used = MESSAGE_OVERHEAD_TOKENS + count_tokens("Earlier in this conversation:")
+    for turn in reversed(older):
+        if used + turn.summary_tokens > summary_budget:
+            break
+        summaries.append(turn.summary)
+        used += turn.summary_tokens
+
+    messages = []
+    if summaries:
+        messages.append({
+            "role": "system",
+            "content": "Earlier in this conversation:\n" + "\n".join(reversed(summaries))
+        })
+    for turn in reversed(verbatim):
+        messages.append({"role": "user", "content": turn.message})
+        messages.append({"role": "assistant", "content": turn.response})
+    return messages
+
+
+class ConversationCache:
+    """Recent turns per user and chat type, so a conversation isn't re-read for every message.
+
+    ``get`` returns None on a miss; the caller loads the last
+    ``max_turns`` turns from the database and ``put``s them. New
+    exchanges are ``append``ed to a cached conversation (write-through),
+    and ``forget`` drops a user's conversations when their history
+    changes. Turns older than ``max_age`` seconds are left out, so a
+    question asked much later starts a fresh conversation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_turns: int, max_age: float):
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.max_turns = max_turns
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, chat_type: Optional[str]) -> Optional[List[Turn]]:
+        """Return the recent turns, oldest first, or None if the conversation isn't cached."""
+        turns = (self._users.get(user_id) or {}).get(chat_type)
+        if turns is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._recent(turns)
+
+    def put(self, user_id: str, chat_type: Optional[str], turns: Sequence[Turn]) -> List[Turn]:
+        """Cache the turns loaded from the database (oldest first); returns them as ``get`` would."""
+        conversations: Dict[Optional[str], Deque[Turn]] = self._users.get(user_id) or {}
+        conversations.pop(chat_type, None)
+        while len(conversations) >= MAX_CONVERSATIONS_PER_USER:
+            del conversations[next(iter(conversations))]
+        conversations[chat_type] = deque(turns, maxlen=self.max_turns)
+        self._users.set(user_id, conversations)
+        return self._recent(conversations[chat_type])
+
+    def append(self, user_id: str, chat_type: Optional[str], turn: Turn) -> None:
+        """Add a new exchange to the conversation, if it is cached."""
+        turns = (self._users.get(user_id) or {}).get(chat_type)
+        if turns is not None and (turn.id is None or all(t.id != turn.id for t in turns)):
+            turns.append(turn)
+
+    def _recent(self, turns: Sequence[Turn]) -> List[Turn]:
+        cutoff = time.time() - self.max_age
+        return [turn for turn in turns if turn.created_at >= cutoff]
+
+    def forget(self, user_id: str) -> None:
+        """Drop all of a user's cached conversations."""
+        self._users.pop(user_id)
+
+    def stats(self) -> dict:
+        """Return cached users and conversation hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._users),
+            "maxsize": self._users.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._users.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -3,12 +3,20 @@ Database configuration and session management
 Supports both PostgreSQL (production) and SQLite (development)
 """
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import Any, AsyncGenerator, Callable, Optional
 import os
+import time
 
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.write_queue import WriteQueue, WriteJob
 
 # Base class for models
 Base = declarative_base()
@@ -29,33 +37,283 @@ def get_database_url() -> str:
 
 DATABASE_URL = get_database_url()
 
-# Create async engine with appropriate settings
-if DATABASE_URL.startswith('sqlite'):
-    # SQLite settings
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=settings.DEBUG,
-        connect_args={"check_same_thread": False}
+# SQLite production mode: WAL and pragmas, a read pool and a single writer queue
+SQLITE_TUNED = (
+    settings.SQLITE_TUNED
+    and DATABASE_URL.startswith("sqlite")
+    and ":memory:" not in DATABASE_URL
+)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a connection."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def create_db_engine(url: str, pool_size: Optional[int] = None) -> AsyncEngine:
+    """Create an async engine using the configured pool settings."""
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    elif url.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size or settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args
     )
+
+
+def configure_sqlite(async_engine: AsyncEngine, read_only: bool = False) -> None:
+    """Apply the production pragmas and explicit transaction control to a SQLite engine.
+    
+    pysqlite's implicit BEGIN is turned off and SQLAlchemy emits BEGIN
+    itself, which makes SAVEPOINTs reliable and lets a connection ask for
+    ``BEGIN IMMEDIATE`` (``sqlite_begin`` execution option) to take the
+    write lock up front instead of failing to upgrade a read lock later.
+    """
+    sync_engine = async_engine.sync_engine
+    
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    
+    @event.listens_for(sync_engine, "begin")
+    def _begin(conn):
+        options = conn.get_execution_options()
+        if options.get("isolation_level") != "AUTOCOMMIT":
+            conn.exec_driver_sql(options.get("sqlite_begin", "BEGIN"))
+
+
+def get_pool_stats(async_engine: AsyncEngine) -> dict:
+    """Live connection-pool metrics for an engine."""
+    pool = async_engine.pool
+    if not isinstance(pool, InstrumentedAsyncQueuePool):
+        return {"status": pool.status()}
+    
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow_in_use": max(pool.overflow(), 0),
+        "utilization": round(checked_out / capacity, 4) if capacity else 0.0,
+        "checkouts": pool.checkouts,
+        "timeouts": pool.timeouts,
+        "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+        "wait_max_ms": round(pool.wait_max * 1000, 3),
+    }
+
+
+engine = create_db_engine(DATABASE_URL)
+if SQLITE_TUNED:
+    configure_sqlite(engine)
+
+# Optional read replica; without one, reads use the primary engine
+if settings.DATABASE_READ_URL:
+    read_engine = create_db_engine(settings.DATABASE_READ_URL)
+elif SQLITE_TUNED:
+    # In WAL mode readers don't block the writer, so give them their own pool
+    read_engine = create_db_engine(DATABASE_URL, pool_size=settings.SQLITE_READ_POOL_SIZE)
+    configure_sqlite(read_engine, read_only=True)
 else:
-    # PostgreSQL settings
-    engine = create_async_engine(
-        DATABASE_URL,
-        echo=settings.DEBUG,
-        pool_pre_ping=True,
-        pool_size=5,
-        max_overflow=10
-    )
+    read_engine = engine
+
+# Reads through get_read_db run in autocommit mode: no BEGIN/COMMIT/ROLLBACK
+read_only_primary = engine.execution_options(isolation_level="AUTOCOMMIT")
+read_only_replica = read_engine.execution_options(isolation_level="AUTOCOMMIT")
+
+# Transactions that will write take SQLite's write lock at BEGIN. A deferred
+# transaction that has read can't wait for the lock later: its upgrade fails
+# with "database is locked" at once, regardless of busy_timeout.
+write_engine = engine.execution_options(sqlite_begin="BEGIN IMMEDIATE") if SQLITE_TUNED else engine
+
+# User ids that committed a write recently; their reads stay on the primary
+recent_writers = TTLCache(
+    maxsize=100000,
+    ttl=settings.READ_YOUR_WRITES_SECONDS
+)
+
+
+def _request_user_id(session: Session):
+    request = session.info.get("request")
+    return getattr(request.state, "user_id", None) if request is not None else None
+
+
+class PrimarySession(Session):
+    """Session for the primary that remembers which users just wrote."""
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["wrote"] = True
 
-# Session factory
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _mark_dml_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _pin_recent_writer(session):
+    if session.info.pop("wrote", False):
+        user_id = _request_user_id(session)
+        if user_id:
+            recent_writers.set(str(user_id), True)
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _clear_write_mark(session):
+    session.info.pop("wrote", None)
+    session.info.pop("on_commit", None)
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the session's current transaction commits.
+    
+    Dropped if it rolls back instead. Use it to invalidate caches, so a
+    concurrent read can't re-cache data from before the write.
+    """
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+class ReadSession(Session):
+    """Session that routes reads to the replica.
+    
+    The bind is chosen once, at the first statement (by then the auth
+    dependency has stored the user id on the request): the primary if the
+    user wrote within READ_YOUR_WRITES_SECONDS, the replica otherwise.
+    Either way the connection is in autocommit mode, so reads cost no
+    transaction round trips.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        bind = self.info.get("bind")
+        if bind is None:
+            user_id = _request_user_id(self)
+            if read_engine is engine or (user_id and str(user_id) in recent_writers):
+                bind = read_only_primary.sync_engine
+            else:
+                bind = read_only_replica.sync_engine
+            self.info["bind"] = bind
+        return bind
+
+
+# Session factories
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=PrimarySession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False
 )
 
+AsyncReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=ReadSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
+# Request methods whose sessions only read
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Hot write paths on SQLite go through one writer that batches commits
+write_queue: Optional[WriteQueue] = None
+if SQLITE_TUNED:
+    write_queue = WriteQueue(
+        async_sessionmaker(
+            write_engine,
+            class_=AsyncSession,
+            sync_session_class=PrimarySession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False
+        ),
+        max_batch=settings.SQLITE_WRITE_BATCH_SIZE
+    )
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'migrations')
+
+
+def read_migration(filename: str) -> list:
+    """Split a migration file into statements, dropping comment lines."""
+    with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+        sql = "".join(line for line in f if not line.lstrip().startswith("--"))
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+async def upgrade_sqlite_schema(conn) -> None:
+    """Convert tables in an existing SQLite file that predate a migration.
+    
+    PostgreSQL deployments run backend/migrations/*.sql; SQLite deployments
+    have no migration step, so the SQLite versions are applied here.
+    """
+    result = await conn.exec_driver_sql("PRAGMA table_info(daily_health)")
+    columns = {row[1] for row in result.fetchall()}
+    if columns and "date" not in columns:
+        print("🔄 Converting daily_health to native column types...")
+        for statement in read_migration("003_daily_health_native_types.sqlite.sql"):
+            await conn.exec_driver_sql(statement)
+    
+    result = await conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'health_rollups'"
+    )
+    if columns and result.first() is None:
+        print("🔄 Building health rollups from daily_health...")
+        for statement in read_migration("005_health_rollups.sqlite.sql"):
+            await conn.exec_driver_sql(statement)
+    
+    result = await conn.exec_driver_sql("PRAGMA table_info(users)")
+    user_columns = {row[1] for row in result.fetchall()}
+    if user_columns and "village" not in user_columns:
+        print("🔄 Adding users.village...")
+        for statement in read_migration("006_health_cohorts.sqlite.sql"):
+            await conn.exec_driver_sql(statement)
+
 
 async def init_db():
     """Initialize database tables."""
@@ -64,6 +322,8 @@ async def init_db():
             # Import all models here to ensure they're registered
             from app.models import user, medical  # noqa
             from app.api.endpoints.health import DailyHealth  # noqa
+            if engine.dialect.name == "sqlite":
+                await upgrade_sqlite_schema(conn)
             await conn.run_sync(Base.metadata.create_all)
         print("✅ Database initialized successfully")
     except Exception as e:
@@ -71,14 +331,115 @@ async def init_db():
         print("   The app will run but database features may be limited.")
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency to get database session."""
-    async with AsyncSessionLocal() as session:
+def has_pending_writes(session: AsyncSession) -> bool:
+    """Whether the session has unflushed changes or executed writes since its last commit."""
+    return bool(session.new or session.dirty or session.deleted or session.info.get("wrote"))
+
+
+async def commit_if_dirty(session: AsyncSession) -> bool:
+    """Commit the session only if it has something to commit."""
+    if not has_pending_writes(session):
+        return False
+    await session.commit()
+    return True
+
+
+class UnitOfWorkRoute(APIRoute):
+    """Route that commits the request's database session once, before responding.
+    
+    Endpoints just add/modify objects (flushing if they need generated
+    values); the session from get_db is committed here after the endpoint
+    returns, only if it has writes. Doing it before the response is sent
+    means a failed commit becomes an error response rather than a lost
+    write behind a 200.
+    """
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def unit_of_work_handler(request: Request) -> Response:
+            response = await handler(request)
+            session = getattr(request.state, "db", None)
+            if session is not None:
+                await commit_if_dirty(session)
+            return response
+        
+        return unit_of_work_handler
+
+
+async def end_read(session: AsyncSession) -> None:
+    """End the session's transaction if it has only read so far.
+    
+    On SQLite a request session that will write holds the write lock from
+    its first statement; call this before a slow step (password hashing)
+    so other writers aren't kept waiting. Loaded objects stay usable. Does
+    nothing when the session has writes or commit callbacks pending.
+    """
+    if (
+        SQLITE_TUNED
+        and session.in_transaction()
+        and not has_pending_writes(session)
+        and not session.info.get("on_commit")
+    ):
+        await session.commit()
+
+
+async def execute_write(db: AsyncSession, job: WriteJob) -> Any:
+    """Run a write job, through the SQLite writer queue when it is enabled.
+    
+    ``job`` gets the session to write with and must not touch objects
+    loaded through ``db``. With the queue it runs on the writer and is
+    committed before this returns, after ``db`` has let go of the write
+    lock if it only read; otherwise it runs on ``db`` and is committed
+    with the rest of the request.
+    """
+    if write_queue is None:
+        return await job(db)
+    await end_read(db)
+    return await write_queue.submit(job)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get a unit-of-work database session.
+    
+    Committed by UnitOfWorkRoute; the commit here only covers routes that
+    don't use it, and is skipped when nothing was written. Sessions for
+    POST/PUT/PATCH/DELETE requests start with BEGIN IMMEDIATE on SQLite,
+    so a read followed by a write waits for the lock instead of failing.
+    """
+    bind = engine if request.method in SAFE_METHODS else write_engine
+    async with AsyncSessionLocal(bind=bind, info={"request": request}) as session:
+        request.state.db = session
         try:
             yield session
-            await session.commit()
+            await commit_if_dirty(session)
         except Exception:
             await session.rollback()
             raise
         finally:
             await session.close()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for read-only endpoints.
+    
+    Queries go to the read replica when DATABASE_READ_URL is set, except for
+    users who wrote recently (read-your-writes). Nothing is committed.
+    """
+    async with AsyncReadSessionLocal(info={"request": request}) as session:
+        yield session
+
+
+def upsert_insert(db: AsyncSession, table):
+    """INSERT for the session's dialect that supports ON CONFLICT clauses.
+    
+    Both PostgreSQL and SQLite (3.24+) accept ``on_conflict_do_update`` /
+    ``on_conflict_do_nothing`` with the same arguments, so callers can build
+    one upsert statement for either database.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
@@ -0,0 +1,51 @@
+"""
+Shared outbound HTTP client
+"""
+
+from typing import Optional
+import httpx
+
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled keep-alive client configured from settings."""
+    return httpx.AsyncClient(
+        http2=settings.HTTP_CLIENT_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_CLIENT_READ_TIMEOUT,
+            connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+            pool=settings.HTTP_CLIENT_POOL_TIMEOUT
+        )
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the application-scoped client (called from the lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the application-scoped client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
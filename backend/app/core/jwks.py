@@ -0,0 +1,117 @@
+"""
+Supabase JWT signing-key cache for offline token verification
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+
+
+class JWKSCache:
+    """Cached JSON Web Key Set with background and on-demand refresh.
+
+    Keys are indexed by ``kid``. The set is refreshed every
+    ``refresh_interval`` seconds by a background task, and immediately when a
+    token references an unknown ``kid`` (key rotation), at most once every
+    ``min_refresh_interval`` seconds so unknown kids can't be used to hammer
+    the key endpoint.
+
+    ``get_client`` returns the (shared) client used for fetches; without it
+    a short-lived client is created per fetch.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        refresh_interval: float = 600.0,
+        min_refresh_interval: float = 30.0,
+        timeout: float = 5.0,
+        get_client: Optional[Callable[[], httpx.AsyncClient]] = None
+    ):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.get_client = get_client
+        self._keys: Dict[str, dict] = {}
+        self._last_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    @property
+    def keys(self) -> Dict[str, dict]:
+        """Currently cached keys by kid."""
+        return self._keys
+
+    async def fetch(self) -> Dict[str, dict]:
+        """Download the key set (no caching)."""
+        if self.get_client is not None:
+            response = await self.get_client().get(self.jwks_url, timeout=self.timeout)
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.get(self.jwks_url)
+        response.raise_for_status()
+        data = response.json()
+        return {
+            key["kid"]: key
+            for key in data.get("keys", [])
+            if key.get("kid")
+        }
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Refresh the cached keys. Returns True if the key set was updated."""
+        async with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_attempt < self.min_refresh_interval:
+                return False
+            self._last_attempt = now
+            self.fetches += 1
+            try:
+                keys = await self.fetch()
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                # Keep serving the last known keys until the endpoint recovers
+                self.fetch_errors += 1
+                print(f"⚠️  JWKS refresh failed: {e}")
+                return False
+            self._keys = keys
+            return True
+
+    async def get_key(self, kid: str) -> Optional[dict]:
+        """Return the key for ``kid``, refreshing once if it is unknown."""
+        key = self._keys.get(kid)
+        if key is None:
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh(force=True)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start refreshing keys in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the background refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Return key count and fetch counters."""
+        return {
+            "keys": len(self._keys),
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+        }
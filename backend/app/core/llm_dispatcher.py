@@ -0,0 +1,256 @@
+"""
+Admission control for upstream LLM calls (concurrency, token budget, priority lanes, retries)
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of letting a call wait for a slot it won't get soon."""
+
+
+class _Waiter:
+    """A call waiting for a slot."""
+
+    def __init__(self, lane: str, rank: int, seq: int, tokens: int, future: asyncio.Future):
+        self.lane = lane
+        self.rank = rank
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.queued = True
+        self.granted = False
+
+
+class LLMDispatcher:
+    """Starts at most ``max_concurrency`` upstream calls at once, within a token budget.
+
+    Calls that can't start right away wait in priority order: ``lanes``
+    names the lanes from most to least urgent (unknown lanes count as the
+    last one), first come, first served within a lane. The queue holds at
+    most ``max_queue`` calls; when it is full a new call displaces the
+    newest waiter of a less urgent lane, or is turned away. A call that
+    has waited ``queue_timeout`` seconds is turned away too. Turned-away
+    calls raise LLMOverloaded right then, so callers can answer without
+    the model instead of timing out.
+
+    The budget is a bucket of up to ``tokens_per_minute`` tokens that
+    refills continuously. A call takes its estimated tokens when it
+    starts; ``charge`` settles the difference once the real usage is
+    known. 0 disables the budget.
+
+    ``retry`` re-runs a call that failed with an error ``retryable``
+    accepts, up to ``max_retries`` times, sleeping a random time of up
+    to ``backoff * 2 ** attempt`` seconds (capped at ``max_backoff``)
+    in between so retries from many callers spread out.
+    """
+
+    def __init__(
+        self,
+        lanes: Sequence[str],
+        max_concurrency: int,
+        tokens_per_minute: int = 0,
+        max_queue: int = 100,
+        queue_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        retryable: Optional[Callable[[Exception], bool]] = None
+    ):
+        self.lanes = list(lanes)
+        self._ranks = {lane: rank for rank, lane in enumerate(self.lanes)}
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retryable = retryable or (lambda error: False)
+
+        self.active = 0
+        self._waiting: List[tuple] = []  # Heap of (rank, seq, waiter); turned-away waiters are skipped
+        self._depth = 0
+        self._seq = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled = time.monotonic()
+        self._refill_timer: Optional[asyncio.TimerHandle] = None
+
+        self.retries = 0
+        self.failures = 0
+        self._lane_stats: Dict[str, dict] = {
+            lane: {"queued": 0, "started": 0, "rejected": 0, "waits_ms": deque(maxlen=1024)}
+            for lane in self.lanes
+        }
+
+    async def acquire(self, lane: str, tokens: int = 0) -> None:
+        """Wait for a slot (and ``tokens`` of budget) in ``lane``; pair with ``release``."""
+        lane = lane if lane in self._ranks else self.lanes[-1]
+        if not self._depth and self._can_start(tokens):
+            self._start(lane, tokens, time.monotonic())
+            return
+
+        waiter = self._enqueue(lane, tokens)
+        timer = asyncio.get_running_loop().call_later(
+            self.queue_timeout, self._reject, waiter, "no upstream slot within the queue timeout"
+        )
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.granted:
+                self.release()
+            else:
+                self._leave(waiter)
+            raise
+        finally:
+            timer.cancel()
+
+    def release(self) -> None:
+        """Free the slot taken by ``acquire``."""
+        self.active -= 1
+        self._pump()
+
+    def charge(self, tokens: int) -> None:
+        """Take ``tokens`` more from the budget (negative to give some back)."""
+        if self.tokens_per_minute:
+            self._refill()
+            self._tokens = min(self.tokens_per_minute, self._tokens - tokens)
+
+    async def retry(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await fn()``, retrying retryable errors with jittered backoff."""
+        for attempt in itertools.count():
+            try:
+                return await fn()
+            except Exception as error:
+                if attempt >= self.max_retries or not self.retryable(error):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    async def call(self, lane: str, tokens: int, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` in a slot of ``lane``, with retries."""
+        await self.acquire(lane, tokens)
+        try:
+            return await self.retry(fn)
+        finally:
+            self.release()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.tokens_per_minute,
+            self._tokens + (now - self._refilled) * self.tokens_per_minute / 60
+        )
+        self._refilled = now
+
+    def _can_start(self, tokens: int) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        if not self.tokens_per_minute:
+            return True
+        self._refill()
+        # A call bigger than the whole bucket starts once the bucket is full
+        return self._tokens >= min(tokens, self.tokens_per_minute)
+
+    def _start(self, lane: str, tokens: int, enqueued: float) -> None:
+        self.active += 1
+        if self.tokens_per_minute:
+            self._tokens -= tokens
+        stats = self._lane_stats[lane]
+        stats["started"] += 1
+        stats["waits_ms"].append((time.monotonic() - enqueued) * 1000)
+
+    def _enqueue(self, lane: str, tokens: int) -> _Waiter:
+        rank = self._ranks[lane]
+        if self._depth >= self.max_queue:
+            queued = [waiter for _, _, waiter in self._waiting if waiter.queued]
+            victim = max(queued, key=lambda waiter: (waiter.rank, waiter.seq), default=None)
+            if victim is None or victim.rank <= rank:
+                self._lane_stats[lane]["rejected"] += 1
+                raise LLMOverloaded("upstream queue is full")
+            self._reject(victim, "displaced by a more urgent request")
+
+        waiter = _Waiter(lane, rank, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiting, (waiter.rank, waiter.seq, waiter))
+        self._depth += 1
+        self._lane_stats[lane]["queued"] += 1
+        return waiter
+
+    def _leave(self, waiter: _Waiter) -> None:
+        if waiter.queued:
+            waiter.queued = False
+            self._depth -= 1
+            self._lane_stats[waiter.lane]["queued"] -= 1
+
+    def _reject(self, waiter: _Waiter, reason: str) -> None:
+        if not waiter.queued or waiter.future.done():
+            return
+        self._leave(waiter)
+        self._lane_stats[waiter.lane]["rejected"] += 1
+        waiter.future.set_exception(LLMOverloaded(reason))
+
+    def _pump(self) -> None:
+        """Start waiting calls, most urgent first, while slots and budget allow."""
+        while self._waiting:
+            waiter = self._waiting[0][2]
+            if not waiter.queued or waiter.future.done():
+                heapq.heappop(self._waiting)
+                self._leave(waiter)
+                continue
+            if not self._can_start(waiter.tokens):
+                if self.active < self.max_concurrency:
+                    self._wait_for_budget(waiter.tokens)
+                return
+            heapq.heappop(self._waiting)
+            self._leave(waiter)
+            self._start(waiter.lane, waiter.tokens, waiter.enqueued)
+            waiter.granted = True
+            waiter.future.set_result(None)
+
+    def _wait_for_budget(self, tokens: int) -> None:
+        if self._refill_timer is not None:
+            return
+        missing = min(tokens, self.tokens_per_minute) - self._tokens
+        self._refill_timer = asyncio.get_running_loop().call_later(
+            missing * 60 / self.tokens_per_minute, self._on_refill
+        )
+
+    def _on_refill(self) -> None:
+        self._refill_timer = None
+        self._pump()
+
+    def stats(self) -> dict:
+        """Return slot, queue and budget usage, plus per-lane queue depth and wait times."""
+        lanes = {}
+        for lane, stats in self._lane_stats.items():
+            waits = sorted(stats["waits_ms"])
+            lanes[lane] = {
+                "queue_depth": stats["queued"],
+                "started": stats["started"],
+                "rejected": stats["rejected"],
+                "wait_ms_p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+                "wait_ms_max": round(waits[-1], 2) if waits else 0.0,
+            }
+        if self.tokens_per_minute:
+            self._refill()
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._depth,
+            "max_queue": self.max_queue,
+            "tokens_available": int(self._tokens) if self.tokens_per_minute else None,
+            "tokens_per_minute": self.tokens_per_minute,
+            "retries": self.retries,
+            "failures": self.failures,
+            "lanes": lanes,
+        }
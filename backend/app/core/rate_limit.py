@@ -0,0 +1,66 @@
+"""
+In-process rate limiting
+"""
+
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets.
+
+    Each key gets a bucket holding up to ``burst`` tokens that refills at
+    ``rate`` tokens per second; a request is allowed if it can take ``cost``
+    tokens. Buckets are kept in LRU order and capped at ``max_keys`` so a
+    flood of distinct keys can't grow memory without bound (an evicted key
+    simply starts again with a full bucket).
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _bucket(self, key: Hashable, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            tokens, last = bucket
+            bucket[0] = min(float(self.burst), tokens + (now - last) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        """Take ``cost`` tokens from ``key``'s bucket if available."""
+        bucket = self._bucket(key, time.monotonic())
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self, key: Hashable, cost: float = 1.0) -> float:
+        """Seconds until ``key`` can spend ``cost`` tokens."""
+        bucket = self._buckets.get(key)
+        if bucket is None or self.rate <= 0:
+            return 0.0 if bucket is None else float("inf")
+        tokens = min(float(self.burst), bucket[0] + (time.monotonic() - bucket[1]) * self.rate)
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def stats(self) -> dict:
+        """Return tracked key count and allow/reject counters."""
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,212 @@
+"""
+Response cache for repeated questions (exact and approximate matches)
+"""
+
+import re
+import time
+import unicodedata
+import zlib
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.cache import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Sentence punctuation stripped from the ends of a word when comparing
+# content words; symbols that change the meaning (+ - < > % /) are kept
+_SENTENCE_PUNCTUATION = "?!.,;:\"'()[]"
+
+# Words that don't change what a question asks. Negation and polarity words
+# (not, no, never, without, high, low, more, less, ...) are deliberately
+# absent: two questions only share an answer if they agree on all of them.
+_STOPWORDS = frozenset("""
+    a an the i me my we our you your he she it its they their this that these those
+    am is are was were be been being do does did can could should would will shall may might must
+    what which who whom whose when where why how
+    to of in on at for from with by about as into onto than then so
+    and or but if also just please tell know want need
+""".split())
+
+
+def normalize_question(text: str) -> str:
+    """Case-fold and collapse whitespace; punctuation and symbols are kept.
+
+    This is the exact-match key, so "O- to A+" and "O+ to A-" stay apart.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_words(normalized: str) -> frozenset:
+    """Words of a normalized question that carry meaning, plurals folded.
+
+    Only sentence punctuation is stripped from each word, so "o-", "a+"
+    and ">" remain words of their own.
+    """
+    words = (word.strip(_SENTENCE_PUNCTUATION) for word in normalized.split())
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in words
+        if word and word not in _STOPWORDS
+    )
+
+
+def question_vector(normalized: str, dims: int) -> np.ndarray:
+    """Hashed bag of words and character trigrams, L2-normalized.
+
+    Punctuation is folded away here only: trigrams make the match
+    tolerant of typos and inflections ("fevers", "feaver"); whole words
+    keep unrelated questions that share letters apart. Counts are damped
+    with log1p so one repeated word can't dominate.
+    """
+    words = _PUNCTUATION.sub(" ", normalized).split()
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    vector = np.zeros(dims, dtype=np.float32)
+    if not features:
+        return vector
+    buckets = np.fromiter(
+        (zlib.crc32(feature.encode()) % dims for feature in features),
+        dtype=np.int64,
+        count=len(features)
+    )
+    np.add.at(vector, buckets, 1.0)
+    np.log1p(vector, out=vector)
+    vector /= np.linalg.norm(vector)
+    return vector
+
+
+class _SimilarityIndex:
+    """Vectors of the most recently cached questions in one namespace (a ring buffer)."""
+
+    def __init__(self, size: int, dims: int):
+        self.vectors = np.zeros((size, dims), dtype=np.float32)
+        self.keys: List[Optional[str]] = [None] * size
+        self.words: List[frozenset] = [frozenset()] * size
+        self.rows: Dict[str, int] = {}
+        self.next_row = 0
+        self.last_added = time.monotonic()
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        row = self.rows.get(key)
+        if row is None:
+            row = self.next_row
+            self.next_row = (row + 1) % len(self.keys)
+            evicted = self.keys[row]
+            if evicted is not None:
+                del self.rows[evicted]
+            self.rows[key] = row
+            self.keys[row] = key
+        self.vectors[row] = vector
+        self.words[row] = content_words(key)
+        self.last_added = time.monotonic()
+
+    def nearest(self, key: str, vector: np.ndarray, threshold: float) -> Optional[str]:
+        scores = self.vectors @ vector
+        row = int(np.argmax(scores))
+        if scores[row] < threshold or self.keys[row] is None:
+            return None
+        # Close as text isn't enough: "2 year old" and "20 year old", or "safe"
+        # and "unsafe", ask different things. Numbers are words here too.
+        if self.words[row] != content_words(key):
+            return None
+        return self.keys[row]
+
+
+class ResponseCache:
+    """TTL/LRU cache of answers keyed by (namespace, normalized question).
+
+    Lookups first try the exact normalized text. When ``similarity`` is
+    above 0, a miss then compares the question with the last
+    ``index_size`` cached questions of the same namespace and reuses the
+    answer of the closest one if its cosine similarity reaches
+    ``similarity`` and both use the same content words (so only word
+    order, filler words and plurals may differ). Namespaces in
+    ``exact_namespaces`` only ever match exactly. Only answers still in
+    the exact cache can be matched, so the TTL and size bound apply to
+    both tiers; a namespace's index is dropped once all of its entries
+    have expired.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 86400.0,
+        similarity: float = 0.0,
+        index_size: int = 2048,
+        dims: int = 4096,
+        exact_namespaces: Iterable[Hashable] = ()
+    ):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.similarity = similarity
+        self.exact_namespaces = frozenset(exact_namespaces)
+        self.index_size = index_size
+        self.dims = dims
+        self._indexes: Dict[Hashable, _SimilarityIndex] = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, namespace: Hashable, question: str) -> Optional[str]:
+        """Return a cached answer for ``question``, or None."""
+        key = normalize_question(question)
+        answer = self._entries.get((namespace, key))
+        if answer is not None:
+            self.exact_hits += 1
+            return answer
+
+        index = self._index(namespace)
+        if index is not None and key:
+            match = index.nearest(key, question_vector(key, self.dims), self.similarity)
+            answer = self._entries.get((namespace, match)) if match else None
+            if answer is not None:
+                self.similar_hits += 1
+                return answer
+
+        self.misses += 1
+        return None
+
+    def set(self, namespace: Hashable, question: str, answer: str) -> None:
+        """Cache ``answer`` for ``question``."""
+        key = normalize_question(question)
+        if not key:
+            return
+        self._entries.set((namespace, key), answer)
+        if self.similarity > 0 and namespace not in self.exact_namespaces:
+            index = self._index(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _SimilarityIndex(self.index_size, self.dims)
+            index.add(key, question_vector(key, self.dims))
+
+    def _index(self, namespace: Hashable) -> Optional[_SimilarityIndex]:
+        index = self._indexes.get(namespace)
+        # Every entry expires at most ``ttl`` after it was added
+        if index is not None and time.monotonic() >= index.last_added + self._entries.ttl:
+            del self._indexes[namespace]
+            return None
+        return index
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+        self._indexes.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit counters for both tiers."""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "similarity_indexes": len(self._indexes),
+            "maxsize": self._entries.maxsize,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+        }
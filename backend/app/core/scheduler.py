@@ -0,0 +1,72 @@
+"""
+Periodic background tasks
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class PeriodicTask:
+    """Runs ``job`` every ``interval`` seconds in the background.
+
+    The first run happens right after ``start``. A failing run is logged
+    and counted; the task keeps its schedule.
+    """
+
+    def __init__(self, name: str, job: Callable[[], Awaitable[Any]], interval: float):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.last_duration_ms: Optional[float] = None
+        self.last_result: Any = None
+
+    async def run_once(self) -> Any:
+        """Run the job now and record the outcome; a failure is re-raised."""
+        start = time.perf_counter()
+        try:
+            self.last_result = await self.job()
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️  {self.name} failed: {e}")
+            raise
+        finally:
+            self.runs += 1
+            self.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        return self.last_result
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                pass  # Already logged and counted; try again next time
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start running the job on its schedule."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Cancel the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Return run counters and the last run's duration and result."""
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result,
+        }
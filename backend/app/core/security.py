@@ -3,20 +3,85 @@ Security utilities for authentication and authorization
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Any
-from jose import JWTError, jwt
+from typing import Optional, Any, Callable
+from uuid import UUID
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import math
+import secrets
+import time
+from jose import JWTError, ExpiredSignatureError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 import httpx
 
 from app.core.config import settings
+from app.core.database import get_db, end_read
+from app.core.cache import TTLCache
+from app.core.rate_limit import TokenBucketLimiter
+from app.core.jwks import JWKSCache
+from app.core.http_client import get_http_client
+from app.models.user import User
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+_pending_password_jobs = 0
 
 # Bearer token scheme
 bearer_scheme = HTTPBearer()
+optional_bearer_scheme = HTTPBearer(auto_error=False)
+
+# Verified tokens -> user claims, so repeat requests skip verification
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
+
+# Rejected tokens -> error detail, so retries of a bad token fail fast
+rejected_token_cache = TTLCache(
+    maxsize=settings.AUTH_NEGATIVE_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_NEGATIVE_CACHE_TTL_SECONDS
+)
+
+# Token verifications per client IP, authenticated requests per user
+ip_rate_limiter = TokenBucketLimiter(
+    rate=settings.AUTH_IP_RATE_PER_SECOND,
+    burst=settings.AUTH_IP_BURST
+)
+user_rate_limiter = TokenBucketLimiter(
+    rate=settings.AUTH_USER_RATE_PER_SECOND,
+    burst=settings.AUTH_USER_BURST
+)
+
+# Column snapshots of resolved User rows, keyed by token id (or email)
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+# Supabase signing keys for offline verification
+SUPABASE_JWT_ISSUER = settings.SUPABASE_JWT_ISSUER or f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1"
+SUPABASE_ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+supabase_jwks = JWKSCache(
+    settings.SUPABASE_JWKS_URL or f"{SUPABASE_JWT_ISSUER}/.well-known/jwks.json",
+    refresh_interval=settings.SUPABASE_JWKS_REFRESH_SECONDS,
+    get_client=get_http_client
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -29,6 +94,34 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_password_job(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a bcrypt call in the password pool, shedding load when it is full."""
+    global _pending_password_jobs
+    if _pending_password_jobs >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    
+    _pending_password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        _pending_password_jobs -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_password_job(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -42,6 +135,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_refresh_token() -> tuple:
+    """Create an opaque refresh token. Returns (token, token_hash)."""
+    token = secrets.token_urlsafe(48)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage and lookup.
+    
+    Refresh tokens are 384 random bits, so a fast hash is enough; no bcrypt.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 def decode_token(token: str) -> dict:
     """Decode and validate a JWT token."""
     try:
@@ -55,61 +162,267 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def verify_supabase_token(token: str) -> dict:
-    """Verify a Supabase JWT token."""
+def supabase_user_from_claims(claims: dict) -> dict:
+    """Shape verified Supabase JWT claims like the /auth/v1/user response."""
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "phone": claims.get("phone"),
+        "role": claims.get("role"),
+        "aud": claims.get("aud"),
+        "app_metadata": claims.get("app_metadata") or {},
+        "user_metadata": claims.get("user_metadata") or {}
+    }
+
+
+async def verify_supabase_token_locally(token: str) -> Optional[dict]:
+    """Verify a Supabase JWT without calling Supabase.
+    
+    Returns the user if the signature and claims check out, raises 401 if
+    the token is definitely invalid, and returns None when it can't be
+    decided locally (no secret configured for HS256, or a key id that is
+    missing from the JWKS even after a refresh).
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid Supabase token"
+    )
+    
     try:
-        # Decode token using Supabase's JWT secret
-        # In production, use Supabase's JWT verification
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.SUPABASE_URL}/auth/v1/user",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            if response.status_code == 200:
-                return response.json()
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Supabase token"
-            )
-    except Exception as e:
+        header = jwt.get_unverified_header(token)
+        unverified_claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        raise invalid
+    
+    # Supabase always sets iss; anything else was not issued by this project
+    if unverified_claims.get("iss") != SUPABASE_JWT_ISSUER:
+        raise invalid
+    
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            return None
+        key: Any = settings.SUPABASE_JWT_SECRET
+    elif algorithm in SUPABASE_ASYMMETRIC_ALGORITHMS:
+        kid = header.get("kid")
+        key = await supabase_jwks.get_key(kid) if kid else None
+        if key is None:
+            return None
+    else:
+        raise invalid
+    
+    audience = settings.SUPABASE_JWT_AUDIENCE or None
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=audience,
+            issuer=SUPABASE_JWT_ISSUER,
+            options={"verify_aud": audience is not None}
+        )
+    except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Supabase token has expired"
+        )
+    except JWTError:
+        raise invalid
+    
+    if not claims.get("sub"):
+        raise invalid
+    return supabase_user_from_claims(claims)
+
+
+async def verify_supabase_token(token: str) -> dict:
+    """Verify a Supabase JWT token.
+    
+    The token is checked offline first; Supabase's /auth/v1/user endpoint
+    is only called when local verification is inconclusive.
+    """
+    if settings.SUPABASE_JWT_LOCAL_VERIFY:
+        user = await verify_supabase_token_locally(token)
+        if user is not None:
+            return user
+    
+    try:
+        response = await get_http_client().get(
+            f"{settings.SUPABASE_URL}/auth/v1/user",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "apikey": settings.SUPABASE_KEY
+            }
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Token verification failed: {str(e)}"
         )
+    
+    if response.status_code == 200:
+        return response.json()
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid Supabase token"
+    )
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
-) -> dict:
-    """Get current user from JWT token."""
-    token = credentials.credentials
+def token_cache_key(token: str) -> str:
+    """Cache key for a bearer token (the raw token is never stored)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def cache_verified_token(token: str, user: dict) -> None:
+    """Cache a verified token's user claims until the token expires."""
+    ttl = None
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+        if exp is not None:
+            ttl = float(exp) - time.time()
+    except (JWTError, TypeError, ValueError):
+        pass
+    token_cache.set(token_cache_key(token), user, ttl=ttl)
+
+
+def _enforce_rate_limit(limiter: TokenBucketLimiter, key: Any) -> None:
+    """Raise 429 if ``key`` has exhausted its bucket."""
+    if not limiter.allow(key):
+        retry_after = max(1, math.ceil(limiter.retry_after(key)))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def _verify_token(token: str, cache_key: str) -> dict:
+    """Verify an uncached token and cache the outcome either way."""
+    provider_error: Optional[HTTPException] = None
     
     # First try Supabase token verification
     if settings.SUPABASE_URL and settings.SUPABASE_KEY:
         try:
             user = await verify_supabase_token(token)
+            cache_verified_token(token, user)
             return user
-        except:
-            pass
+        except HTTPException as e:
+            if e.status_code != status.HTTP_401_UNAUTHORIZED:
+                provider_error = e
     
     # Fallback to local JWT verification
-    payload = decode_token(token)
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-    return {"id": user_id, "email": payload.get("email")}
+    try:
+        payload = decode_token(token)
+        if payload.get("sub") is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials"
+            )
+    except HTTPException as e:
+        if provider_error is not None:
+            # Supabase was unreachable, so the token may still be valid
+            raise provider_error
+        rejected_token_cache.set(cache_key, e.detail)
+        raise
+    
+    user = {"id": payload["sub"], "email": payload.get("email")}
+    cache_verified_token(token, user)
+    return user
 
 
-def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> dict:
+    """Get current user from JWT token.
+    
+    Verified and rejected tokens are both cached, so only a token's first
+    use costs a signature check or a call to Supabase. Those first uses are
+    rate limited per client IP, and authenticated requests per user.
+    """
+    token = credentials.credentials
+    cache_key = token_cache_key(token)
+    
+    user = token_cache.get(cache_key)
+    if user is None:
+        rejected = rejected_token_cache.get(cache_key)
+        if rejected is not None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=rejected,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Behind a proxy listed in FORWARDED_ALLOW_IPS, uvicorn has already
+        # replaced this with the X-Forwarded-For client address
+        client_ip = request.client.host if request.client else "unknown"
+        _enforce_rate_limit(ip_rate_limiter, client_ip)
+        user = await _verify_token(token, cache_key)
+    
+    _enforce_rate_limit(user_rate_limiter, user.get("id"))
+    request.state.user_id = user.get("id")
+    return dict(user)
+
+
+async def get_current_user_optional(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer_scheme)
 ) -> Optional[dict]:
     """Get current user if authenticated, else None."""
     if credentials is None:
         return None
     try:
-        return get_current_user(credentials)
+        return await get_current_user(request, credentials)
     except HTTPException:
         return None
+
+
+def _user_cache_key(user_id: Optional[str], email: Optional[str]) -> str:
+    return f"id:{user_id}" if user_id else f"email:{email}"
+
+
+def invalidate_cached_user(user: User) -> None:
+    """Drop a user's cached row, e.g. after it was updated or its role changed."""
+    user_cache.pop(_user_cache_key(str(user.id), None))
+    user_cache.pop(_user_cache_key(None, user.email))
+
+
+async def get_current_db_user(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """Resolve the current user's database row, including their role.
+    
+    The row is looked up at most once per request (and kept on
+    request.state.db_user); between requests a column snapshot is kept in
+    user_cache and re-attached to the session without a query. Returns None
+    if the token's user has no local row yet.
+    """
+    if hasattr(request.state, "db_user"):
+        return request.state.db_user
+    
+    user_id = current_user.get("id")
+    email = current_user.get("email")
+    cache_key = _user_cache_key(user_id, email)
+    
+    snapshot = user_cache.get(cache_key)
+    if snapshot is not None:
+        cached_user = User(**snapshot)
+        make_transient_to_detached(cached_user)
+        user = await db.merge(cached_user, load=False)
+    else:
+        if user_id:
+            result = await db.execute(select(User).where(User.id == UUID(user_id)))
+        else:
+            result = await db.execute(select(User).where(User.email == email))
+        user = result.scalar_one_or_none()
+        if user is not None:
+            user_cache.set(cache_key, {
+                attr.key: getattr(user, attr.key)
+                for attr in sa_inspect(User).column_attrs
+            })
+        # Like a cached row, the lookup needn't hold the write lock for the handler
+        await end_read(db)
+    
+    request.state.db_user = user
+    return user
@@ -0,0 +1,67 @@
+"""
+Single-flight calls: concurrent callers with the same key share one call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and fans its result out.
+
+    The first caller for a key starts ``fn`` in a task of its own; callers
+    arriving while it runs await the same task instead of starting another
+    call, and get its result or its exception. Each call is bounded by
+    ``timeout``, so a hung upstream fails all of its waiters at once and
+    frees the key. A waiter that is cancelled (its client went away)
+    doesn't cancel the call the others are waiting on.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await fn()``, sharing the call already in flight for ``key`` if any."""
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = asyncio.create_task(self._run(fn))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    async def _run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await asyncio.wait_for(fn(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+
+    def _finish(self, key: Hashable, flight: asyncio.Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Nobody may be left waiting; don't report the exception as unretrieved
+        if not flight.cancelled():
+            flight.exception()
+
+    def stats(self) -> dict:
+        """Return the number of calls in flight and the call counters."""
+        requests = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "coalesced_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,97 @@
+"""
+Streaming helpers: request bodies (NDJSON, gzip) and server-sent events
+"""
+
+import json
+import zlib
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException, Request, status
+
+# Cap on a gzip body's decompressed size
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+# Decompress at most this much per step so one small chunk can't expand
+# into a huge buffer
+DECOMPRESS_STEP = 64 * 1024
+
+
+def is_ndjson(request: Request) -> bool:
+    """Whether the request body is newline-delimited JSON."""
+    content_type = request.headers.get("content-type", "")
+    return "ndjson" in content_type or "jsonl" in content_type
+
+
+async def iter_body(request: Request) -> AsyncIterator[bytes]:
+    """Yield the request body, decompressing it if Content-Encoding is gzip."""
+    if request.headers.get("content-encoding", "").lower() != "gzip":
+        async for chunk in request.stream():
+            yield chunk
+        return
+
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    total = 0
+    try:
+        async for chunk in request.stream():
+            data = decompressor.decompress(chunk, DECOMPRESS_STEP)
+            while data:
+                total += len(data)
+                if total > MAX_DECOMPRESSED_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Decompressed body is too large"
+                    )
+                yield data
+                data = decompressor.decompress(decompressor.unconsumed_tail, DECOMPRESS_STEP)
+        data = decompressor.flush()
+    except zlib.error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid gzip body"
+        )
+    if data:
+        yield data
+    if not decompressor.eof:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Truncated gzip body"
+        )
+
+
+async def read_json(request: Request) -> Any:
+    """Parse a (possibly gzipped) JSON body. Returns None if it isn't valid JSON."""
+    body = b"".join([chunk async for chunk in iter_body(request)])
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _parse_ndjson_line(line: bytes, line_number: int) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid JSON on line {line_number}"
+        )
+
+
+async def iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    """Yield one parsed object per line of a (possibly gzipped) NDJSON body."""
+    buffer = b""
+    line_number = 0
+    async for chunk in iter_body(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_ndjson_line(line, line_number)
+    if buffer.strip():
+        yield _parse_ndjson_line(buffer, line_number + 1)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,121 @@
+"""
+Single-writer queue for SQLite deployments
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+WriteJob = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteQueue:
+    """Runs write jobs one batch at a time on a single writer.
+
+    SQLite allows one writer at a time; concurrent request transactions
+    contend for the lock and fail with "database is locked". Jobs submitted
+    here are instead executed by one background task: whatever is queued
+    (up to ``max_batch`` jobs) runs in a single transaction, each job in its
+    own SAVEPOINT so a failing job is rolled back alone, followed by one
+    commit for the whole batch. ``submit`` returns once the batch holding
+    the job has committed.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_batch: int = 64):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue: "asyncio.Queue[Optional[tuple[WriteJob, asyncio.Future]]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def submit(self, job: WriteJob) -> Any:
+        """Queue ``job`` and return its result once it has been committed."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._run_batch(batch)
+            if stopping:
+                return
+
+    async def _run_batch(self, batch: list) -> None:
+        self.batches += 1
+        self.jobs += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        outcomes = []
+        failed = 0
+        try:
+            async with self.session_factory() as session:
+                for job, future in batch:
+                    if future.done():
+                        # Caller went away before the job ran
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await job(session)
+                    except Exception as e:
+                        failed += 1
+                        outcomes.append((future, e))
+                    else:
+                        outcomes.append((future, result))
+                await session.commit()
+        except Exception as e:
+            # The batch didn't commit: every job in it failed
+            self.failed_jobs += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.failed_jobs += failed
+        for future, outcome in outcomes:
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def start(self) -> None:
+        """Start the writer task if it isn't running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish queued jobs, then stop the writer task."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        """Return queue depth and batch counters."""
+        return {
+            "queued": self._queue.qsize(),
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "batches": self.batches,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
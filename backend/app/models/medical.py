@@ -2,7 +2,7 @@
 Medical models for database
 """
 
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Enum as SQLEnum, JSON
+from sqlalchemy import Column, String, DateTime, Date, Integer, BigInteger, SmallInteger, Float, Text, Index, ForeignKey, Enum as SQLEnum, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -18,6 +18,20 @@ class SeverityLevel(str, enum.Enum):
     severe = "severe"
 
 
+class SampleMetric(int, enum.Enum):
+    """Metric codes for intraday health samples."""
+    steps = 1
+    sleep_stage = 2
+
+
+class SleepStage(int, enum.Enum):
+    """Values of sleep_stage samples."""
+    awake = 0
+    light = 1
+    deep = 2
+    rem = 3
+
+
 class MedicalCondition(Base):
     """Medical condition model."""
     __tablename__ = "medical_conditions"
@@ -94,6 +108,9 @@ class BasicInfo(Base):
 class ChatHistory(Base):
     """Chat history for AI conversations."""
     __tablename__ = "chat_history"
+    # Fetch server-generated timestamps in the INSERT/UPDATE (RETURNING) so
+    # responses can be built after a flush without a refresh round trip
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
@@ -107,15 +124,23 @@ class ChatHistory(Base):
 
 
 class DailyHealth(Base):
-    """Daily health tracking."""
+    """Daily health tracking, one row per user per day."""
     __tablename__ = "daily_health"
+    __table_args__ = (
+        # Daily lookups are a single probe; also serves user_id-only queries
+        Index("ix_daily_health_user_date", "user_id", "date", unique=True),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    date = Column(Date, nullable=False)
     
-    steps = Column(String(20), nullable=True)
-    water_intake = Column(String(20), nullable=True)
-    sleep_hours = Column(String(20), nullable=True)
+    steps = Column(Integer, nullable=False, default=0)
+    steps_goal = Column(Integer, nullable=False, default=10000)
+    water_intake = Column(Integer, nullable=False, default=0)  # Glasses
+    water_goal = Column(Integer, nullable=False, default=8)
+    sleep_hours = Column(Float, nullable=True)
+    weight = Column(Float, nullable=True)  # kg
     mood = Column(String(50), nullable=True)
     notes = Column(Text, nullable=True)
     
@@ -124,9 +149,106 @@ class DailyHealth(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class HealthSample(Base):
+    """Intraday wearable samples (minute step counts, sleep stages).
+    
+    Kept compact: integer epoch-second timestamps, a SampleMetric code and an
+    integer value. The primary key (user_id, metric, ts) is also the storage
+    order (WITHOUT ROWID on SQLite), so a chart query for one metric reads a
+    single contiguous range.
+    """
+    __tablename__ = "health_samples"
+    __table_args__ = {"sqlite_with_rowid": False}
+    
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    metric = Column(SmallInteger, primary_key=True, autoincrement=False)
+    ts = Column(BigInteger, primary_key=True, autoincrement=False)  # Epoch seconds (UTC); 32 bits end in 2038
+    value = Column(Integer, nullable=False)
+    duration = Column(Integer, nullable=False, default=60)  # Seconds the sample covers
+
+
+class HealthRollup(Base):
+    """Weekly and monthly summaries of daily_health, one row per user per period.
+    
+    Recomputed for the touched periods on every daily_health write, so
+    dashboards read a few rows instead of scanning the history.
+    """
+    __tablename__ = "health_rollups"
+    __table_args__ = (
+        # Lets the cohort refresh find what changed since its last run
+        Index("ix_health_rollups_updated_at", "updated_at"),
+    )
+    
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    period = Column(String(10), primary_key=True)  # week (starting Monday) or month
+    period_start = Column(Date, primary_key=True)
+    
+    days_logged = Column(Integer, nullable=False, default=0)
+    steps_total = Column(Integer, nullable=False, default=0)
+    steps_goal_days = Column(Integer, nullable=False, default=0)
+    water_total = Column(Integer, nullable=False, default=0)
+    water_goal_days = Column(Integer, nullable=False, default=0)
+    sleep_hours_avg = Column(Float, nullable=True)
+    weight_avg = Column(Float, nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class HealthStreak(Base):
+    """A user's run of consecutive days meeting their steps goal.
+    
+    ``current_streak`` is the run ending on ``last_goal_day``; it only
+    counts as current while that day is today or yesterday.
+    """
+    __tablename__ = "health_streaks"
+    
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_goal_day = Column(Date, nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class HealthCohortWeekly(Base):
+    """Weekly health totals per village, built from the users' weekly rollups.
+    
+    Refreshed in the background for the weeks whose rollups changed since
+    the last run, so admin analytics never scan daily_health. Users without
+    a village are grouped under "".
+    """
+    __tablename__ = "health_cohort_weekly"
+    __table_args__ = (
+        Index("ix_health_cohort_weekly_week", "week_start"),
+    )
+    
+    village = Column(String(100), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    
+    users_reporting = Column(Integer, nullable=False, default=0)
+    days_logged = Column(Integer, nullable=False, default=0)
+    steps_total = Column(Integer, nullable=False, default=0)
+    steps_goal_days = Column(Integer, nullable=False, default=0)
+    water_total = Column(Integer, nullable=False, default=0)
+    water_goal_days = Column(Integer, nullable=False, default=0)
+    sleep_hours_sum = Column(Float, nullable=False, default=0)  # Sum of the users' weekly averages
+    sleep_users = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class AggregateWatermark(Base):
+    """How far a background aggregate has been refreshed."""
+    __tablename__ = "aggregate_watermarks"
+    
+    name = Column(String(100), primary_key=True)
+    refreshed_through = Column(DateTime(timezone=True), nullable=False)
+
+
 class TestBooking(Base):
     """Test booking model for patients."""
     __tablename__ = "test_bookings"
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
@@ -145,6 +267,7 @@ class TestBooking(Base):
 class DoctorAppointment(Base):
     """Doctor appointment booking for patients."""
     __tablename__ = "doctor_appointments"
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     patient_id = Column(UUID(as_uuid=True), nullable=False, index=True)
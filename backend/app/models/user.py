@@ -22,6 +22,7 @@ class User(Base):
     date_of_birth = Column(DateTime, nullable=True)
     gender = Column(String(20), nullable=True)
     address = Column(Text, nullable=True)
+    village = Column(String(100), nullable=True, index=True)  # Cohort for admin health analytics
     
     # User role
     role = Column(String(20), default="patient")  # patient, doctor, admin
@@ -62,3 +63,22 @@ class UserProfile(Base):
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class RefreshToken(Base):
+    """Rotating refresh token, stored only as a SHA-256 hash."""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    
+    # All tokens rotated from the same login share a family; reusing a
+    # rotated token revokes the whole family
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    
+    expires_at = Column(DateTime, nullable=False)  # UTC
+    revoked_at = Column(DateTime, nullable=True)  # UTC
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
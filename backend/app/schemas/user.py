@@ -33,6 +33,7 @@ class UserUpdate(BaseModel):
     date_of_birth: Optional[datetime] = None
     gender: Optional[str] = None
     address: Optional[str] = None
+    village: Optional[str] = Field(None, max_length=100)
 
 
 class UserResponse(UserBase):
@@ -66,6 +67,7 @@ class UserProfileCreate(UserProfileBase):
     gender: str
     phone: str
     address: str
+    village: Optional[str] = Field(None, max_length=100)
 
 
 class UserProfileUpdate(UserProfileBase):
@@ -75,6 +77,7 @@ class UserProfileUpdate(UserProfileBase):
     gender: Optional[str] = None
     phone: Optional[str] = None
     address: Optional[str] = None
+    village: Optional[str] = Field(None, max_length=100)
 
 
 class UserProfileResponse(UserProfileBase):
@@ -90,6 +93,7 @@ class UserProfileResponse(UserProfileBase):
     gender: Optional[str] = None
     phone: Optional[str] = None
     address: Optional[str] = None
+    village: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -99,6 +103,13 @@ class Token(BaseModel):
     """Token schema."""
     access_token: str
     token_type: str = "bearer"
+    expires_in: Optional[int] = None  # Access token lifetime in seconds
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    """Schema for refreshing or revoking a refresh token."""
+    refresh_token: str
 
 
 class TokenData(BaseModel):
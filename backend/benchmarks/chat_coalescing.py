@@ -0,0 +1,110 @@
+"""
+Chat request coalescing benchmark
+
+Many users ask the same question at the same moment (as after a broadcast
+health tip), against a fake OpenAI client with a fixed latency. Reports
+how many upstream calls were made, how many requests were coalesced onto
+them and the request latency. The response cache is cleared between
+rounds so every round starts cold.
+
+    python -m benchmarks.chat_coalescing [--users 50] [--rounds 5] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+
+from benchmarks.common import use_temp_database, summarize
+
+
+class FakeOpenAI:
+    """Stands in for openai.AsyncOpenAI: answers after ``latency`` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        message = types.SimpleNamespace(content=f"Answer to: {kwargs['messages'][-1]['content']}")
+        usage = types.SimpleNamespace(total_tokens=len(message.content) // 4)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+async def run(users: int, rounds: int, latency: float) -> None:
+    from httpx import AsyncClient, ASGITransport
+
+    from main import app
+    from app.core.database import init_db
+    from app.api.endpoints import chat
+
+    fake = FakeOpenAI(latency)
+    chat.openai_client = fake
+
+    await init_db()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        tokens = []
+        for i in range(users):
+            response = await client.post(
+                "/api/v1/auth/register",
+                json={"email": f"user{i}@example.com", "password": "correct-horse"}
+            )
+            tokens.append(response.json()["access_token"])
+
+        send_ms = []
+        answers = set()
+
+        async def ask(token: str, question: str) -> None:
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/chat/send",
+                headers={"Authorization": f"Bearer {token}"},
+                json={"message": question, "chat_type": "medical"}
+            )
+            send_ms.append((time.perf_counter() - start) * 1000)
+            answers.add(response.json().get("response"))
+
+        start = time.perf_counter()
+        for round_number in range(rounds):
+            chat.response_cache.clear()
+            question = f"Is it safe to drink water from the hand pump after the flood? ({round_number})"
+            await asyncio.gather(*[ask(token, question) for token in tokens])
+        elapsed = time.perf_counter() - start
+
+    requests = users * rounds
+    print(f"users={users} rounds={rounds} upstream latency={latency * 1000:.0f}ms")
+    print(f"{requests} requests in {elapsed:.2f}s, {fake.calls} upstream calls, {len(answers)} distinct answers")
+    print(summarize("POST /chat/send", send_ms))
+    print(f"coalescing: {chat.chat_flights.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5, help="bursts of the same question")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream latency in seconds")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the environment first
+    use_temp_database()
+    os.environ["BCRYPT_ROUNDS"] = "4"
+    os.environ["AUTH_IP_RATE_PER_SECOND"] = "100000"
+    os.environ["AUTH_IP_BURST"] = "100000"
+    os.environ["AUTH_USER_RATE_PER_SECOND"] = "100000"
+    os.environ["AUTH_USER_BURST"] = "100000"
+    os.environ["OPENAI_API_KEY"] = ""
+    # Each round is a new question, not a follow-up (follow-ups aren't coalesced)
+    os.environ["CHAT_CONTEXT_TOKENS"] = "0"
+    sys.path.insert(0, os.getcwd())
+
+    asyncio.run(run(args.users, args.rounds, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Shared helpers for benchmark scripts
+"""
+
+import os
+import statistics
+import tempfile
+
+
+def use_temp_database() -> str:
+    """Point the app at a fresh SQLite file. Call before importing the app."""
+    path = os.path.join(tempfile.mkdtemp(prefix="dietec-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("DEBUG", "false")
+    os.environ.setdefault("SUPABASE_KEY", "")
+    return path
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Return the pct-th percentile of samples (nearest rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(label: str, samples_ms: list) -> str:
+    """Format a one-line latency summary in milliseconds."""
+    if not samples_ms:
+        return f"{label:<28} no samples"
+    return (
+        f"{label:<28} n={len(samples_ms):<5} "
+        f"p50={statistics.median(samples_ms):7.2f}ms "
+        f"p99={percentile(samples_ms, 99):7.2f}ms "
+        f"max={max(samples_ms):7.2f}ms"
+    )
@@ -0,0 +1,116 @@
+"""
+Login storm benchmark
+
+Fires a burst of concurrent /auth/login requests and, at the same time,
+probes an unrelated endpoint every few milliseconds. With bcrypt running on
+the event loop the probe's p99 grows with the storm; with the password
+pool it should stay flat.
+
+    python -m benchmarks.login_storm [--logins 40] [--blocking]
+
+--blocking restores the old behaviour (bcrypt inline on the event loop)
+for comparison.
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import use_temp_database, summarize
+
+use_temp_database()
+
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+
+from main import app  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.database import init_db  # noqa: E402
+
+EMAIL = "storm@example.com"
+PASSWORD = "correct-horse"
+
+
+async def probe(client: AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    """Hit /health on a fixed schedule until stopped, returning latencies in ms.
+    
+    Latency is measured from when each probe was *due*, so time spent waiting
+    for a blocked event loop counts against it.
+    """
+    samples = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        await client.get("/health")
+        now = time.perf_counter()
+        samples.append((now - due) * 1000)
+        due += interval
+        while due < now:
+            # Probes that should have fired while the loop was stalled
+            samples.append((now - due) * 1000)
+            due += interval
+        await asyncio.sleep(due - now)
+    return samples
+
+
+async def run(logins: int, interval: float) -> None:
+    await init_db()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(
+            "/api/v1/auth/register",
+            json={"email": EMAIL, "password": PASSWORD}
+        )
+        
+        stop = asyncio.Event()
+        idle_task = asyncio.create_task(probe(client, stop, interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await idle_task
+        
+        stop = asyncio.Event()
+        storm_task = asyncio.create_task(probe(client, stop, interval))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post(
+                "/api/v1/auth/login",
+                json={"email": EMAIL, "password": PASSWORD}
+            )
+            for _ in range(logins)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        storm = await storm_task
+    
+    codes = {}
+    for response in responses:
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+    
+    print(f"bcrypt rounds={security.pwd_context.to_dict()['bcrypt__rounds']} "
+          f"workers={security.password_executor._max_workers}")
+    print(f"{logins} logins in {elapsed:.2f}s, status codes {codes}")
+    print(summarize("GET /health idle", idle))
+    print(summarize("GET /health during storm", storm))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.005, help="probe interval (s)")
+    parser.add_argument("--blocking", action="store_true", help="run bcrypt on the event loop")
+    args = parser.parse_args()
+    
+    if args.blocking:
+        async def verify_inline(plain: str, hashed: str) -> bool:
+            return security.verify_password(plain, hashed)
+        
+        async def hash_inline(password: str) -> str:
+            return security.get_password_hash(password)
+        
+        from app.api.endpoints import auth
+        auth.verify_password_async = verify_inline
+        auth.get_password_hash_async = hash_inline
+    
+    asyncio.run(run(args.logins, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+SQLite concurrency benchmark
+
+Many users post chat messages and step counts at once while others read
+their chat history, all against one SQLite file. Reports throughput,
+latency and how many writes were lost (chat saves that failed, e.g. with
+"database is locked") or errored.
+
+    python -m benchmarks.sqlite_concurrency [--users 16] [--requests 25] [--untuned]
+
+--untuned turns off the SQLite production mode (WAL, pragmas, read pool
+and writer queue) for comparison.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.common import use_temp_database, summarize
+
+
+async def run(users: int, requests: int) -> None:
+    from httpx import AsyncClient, ASGITransport
+
+    from main import app
+    from app.core.database import init_db, write_queue
+
+    await init_db()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        tokens = []
+        for i in range(users):
+            response = await client.post(
+                "/api/v1/auth/register",
+                json={"email": f"user{i}@example.com", "password": "correct-horse"}
+            )
+            tokens.append(response.json()["access_token"])
+
+        write_ms, read_ms = [], []
+        outcomes = {"saved": 0, "lost": 0, "errors": 0}
+
+        async def writer(token: str) -> None:
+            headers = {"Authorization": f"Bearer {token}"}
+            for i in range(requests):
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/chat/send",
+                    headers=headers,
+                    json={"message": f"message {i}", "chat_type": "general"}
+                )
+                write_ms.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    outcomes["errors"] += 1
+                elif "id" in response.json():
+                    outcomes["saved"] += 1
+                else:
+                    outcomes["lost"] += 1
+
+        async def reader(token: str) -> None:
+            headers = {"Authorization": f"Bearer {token}"}
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.get("/api/v1/chat/history", headers=headers)
+                read_ms.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    outcomes["errors"] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[writer(token) for token in tokens],
+            *[reader(token) for token in tokens]
+        )
+        elapsed = time.perf_counter() - start
+
+    writes = users * requests
+    print(f"tuned={write_queue is not None} users={users} writes={writes} reads={writes}")
+    print(f"{2 * writes} requests in {elapsed:.2f}s ({2 * writes / elapsed:.0f} req/s), {outcomes}")
+    print(summarize("POST /chat/send", write_ms))
+    print(summarize("GET /chat/history", read_ms))
+    if write_queue is not None:
+        print(f"writer queue: {write_queue.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=25, help="writes and reads per user")
+    parser.add_argument("--untuned", action="store_true", help="disable SQLite production mode")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the environment first
+    use_temp_database()
+    os.environ["SQLITE_TUNED"] = "false" if args.untuned else "true"
+    os.environ["BCRYPT_ROUNDS"] = "4"
+    os.environ["AUTH_USER_RATE_PER_SECOND"] = "100000"
+    os.environ["AUTH_USER_BURST"] = "100000"
+    os.environ["OPENAI_API_KEY"] = ""
+    sys.path.insert(0, os.getcwd())
+
+    asyncio.run(run(args.users, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Statement count benchmark
+
+Runs a fixed sequence of requests and reports, per endpoint, how many SQL
+statements and transaction-control calls (BEGIN/COMMIT/ROLLBACK) each one
+costs. Each of these is a network round trip on PostgreSQL, so the counts
+are a proxy for database latency that doesn't depend on the machine.
+
+    python -m benchmarks.statement_counts
+
+Connections in AUTOCOMMIT mode don't issue transaction control, so their
+begin/commit/rollback events are not counted.
+"""
+
+import asyncio
+from collections import Counter
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from main import app  # noqa: E402
+from app.core.database import init_db  # noqa: E402
+
+counts = Counter()
+
+
+def _autocommit(conn) -> bool:
+    return conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counts["statements"] += 1
+
+
+@event.listens_for(Engine, "begin")
+def _count_begin(conn):
+    if not _autocommit(conn):
+        counts["begin"] += 1
+
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+    if not _autocommit(conn):
+        counts["commit"] += 1
+
+
+@event.listens_for(Engine, "rollback")
+def _count_rollback(conn):
+    if not _autocommit(conn):
+        counts["rollback"] += 1
+
+
+async def run() -> None:
+    await init_db()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call(label: str, method: str, url: str, **kwargs):
+            counts.clear()
+            response = await client.request(method, url, **kwargs)
+            total = sum(counts.values())
+            print(
+                f"{label:<32} {response.status_code:<4} "
+                f"stmts={counts['statements']:<3} begin={counts['begin']:<2} "
+                f"commit={counts['commit']:<2} rollback={counts['rollback']:<2} "
+                f"total={total}"
+            )
+            return response
+
+        response = await call(
+            "POST /auth/register", "POST", "/api/v1/auth/register",
+            json={"email": "counts@example.com", "password": "correct-horse"}
+        )
+        await call(
+            "POST /auth/login", "POST", "/api/v1/auth/login",
+            json={"email": "counts@example.com", "password": "correct-horse"}
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        await call("GET /users/me", "GET", "/api/v1/users/me", headers=headers)
+        await call(
+            "PUT /users/me", "PUT", "/api/v1/users/me",
+            headers=headers, json={"full_name": "Count Test"}
+        )
+        await call("GET /users/profile", "GET", "/api/v1/users/profile", headers=headers)
+        await call(
+            "POST /medical/conditions", "POST", "/api/v1/medical/conditions",
+            headers=headers, json={"name": "Asthma"}
+        )
+        await call(
+            "POST /medical/basic-info", "POST", "/api/v1/medical/basic-info",
+            headers=headers, json={"age": "30"}
+        )
+        await call("GET /medical/basic-info", "GET", "/api/v1/medical/basic-info", headers=headers)
+        await call(
+            "POST /chat/send", "POST", "/api/v1/chat/send",
+            headers=headers, json={"message": "hello", "chat_type": "general"}
+        )
+        await call("DELETE /chat/history", "DELETE", "/api/v1/chat/history", headers=headers)
+        await call("GET /chat/history", "GET", "/api/v1/chat/history", headers=headers)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -9,7 +9,18 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.api.routes import router as api_router
-from app.core.database import init_db
+from app.core.database import init_db, engine, read_engine, get_pool_stats, write_queue
+from app.core.security import (
+    token_cache,
+    rejected_token_cache,
+    ip_rate_limiter,
+    user_rate_limiter,
+    supabase_jwks
+)
+from app.core.http_client import init_http_client, close_http_client
+from app.api.endpoints.health import insights_cache
+from app.api.endpoints.admin import cohort_refresher
+from app.api.endpoints.chat import response_cache, chat_flights, llm_dispatcher, conversations
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -17,9 +28,21 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting DIETEC Backend...")
     await init_db()
+    await init_http_client()
+    if settings.SUPABASE_JWT_LOCAL_VERIFY and settings.SUPABASE_URL:
+        supabase_jwks.start()
+    if write_queue is not None:
+        write_queue.start()
+    if settings.COHORT_REFRESH_SECONDS:
+        cohort_refresher.start()
     yield
     # Shutdown
     print("🛑 Shutting down DIETEC Backend...")
+    await cohort_refresher.stop()
+    if write_queue is not None:
+        await write_queue.stop()
+    await supabase_jwks.stop()
+    await close_http_client()
 
 app = FastAPI(
     title="DIETEC API",
@@ -37,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API routes
@@ -56,11 +80,33 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    """In-process cache and connection-pool metrics."""
+    return {
+        "db_pool": get_pool_stats(engine),
+        "db_read_pool": get_pool_stats(read_engine) if read_engine is not engine else None,
+        "sqlite_write_queue": write_queue.stats() if write_queue is not None else None,
+        "token_cache": token_cache.stats(),
+        "rejected_token_cache": rejected_token_cache.stats(),
+        "health_insights_cache": insights_cache.stats(),
+        "health_cohort_refresh": cohort_refresher.stats(),
+        "chat_response_cache": response_cache.stats(),
+        "chat_coalescing": chat_flights.stats(),
+        "llm_dispatcher": llm_dispatcher.stats(),
+        "chat_conversations": conversations.stats(),
+        "auth_ip_rate_limiter": ip_rate_limiter.stats(),
+        "auth_user_rate_limiter": user_rate_limiter.stats(),
+        "supabase_jwks": supabase_jwks.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS
     )
@@ -0,0 +1,43 @@
+-- Native column types for daily_health: a real DATE column, integer/float
+-- metrics instead of VARCHAR, and one row per (user_id, date)
+
+ALTER TABLE daily_health ADD COLUMN IF NOT EXISTS date DATE;
+ALTER TABLE daily_health ADD COLUMN IF NOT EXISTS steps_goal INTEGER NOT NULL DEFAULT 10000;
+ALTER TABLE daily_health ADD COLUMN IF NOT EXISTS water_goal INTEGER NOT NULL DEFAULT 8;
+ALTER TABLE daily_health ADD COLUMN IF NOT EXISTS weight DOUBLE PRECISION;
+
+-- Existing rows only carry a timestamp; file them under that (UTC) day
+UPDATE daily_health
+SET date = (COALESCE(created_at, NOW()) AT TIME ZONE 'UTC')::date
+WHERE date IS NULL;
+
+-- Convert the string metrics: counts take the leading number, rounded
+-- ("7.5" is 8, "1200 steps" is 1200); anything non-numeric is missing
+ALTER TABLE daily_health
+  ALTER COLUMN steps TYPE INTEGER
+    USING COALESCE(LEAST(round(substring(steps::text from '^\s*(\d+(?:\.\d+)?)')::numeric), 2147483647)::integer, 0),
+  ALTER COLUMN water_intake TYPE INTEGER
+    USING COALESCE(LEAST(round(substring(water_intake::text from '^\s*(\d+(?:\.\d+)?)')::numeric), 2147483647)::integer, 0),
+  ALTER COLUMN sleep_hours TYPE DOUBLE PRECISION
+    USING CASE
+      WHEN sleep_hours::text ~ '^\s*[0-9]+(\.[0-9]+)?\s*$' THEN sleep_hours::text::double precision
+    END;
+
+-- Keep the most recently updated row for each user and day
+DELETE FROM daily_health d
+USING daily_health newer
+WHERE d.user_id = newer.user_id
+  AND d.date = newer.date
+  AND (COALESCE(newer.updated_at, newer.created_at), newer.id)
+    > (COALESCE(d.updated_at, d.created_at), d.id);
+
+ALTER TABLE daily_health
+  ALTER COLUMN date SET NOT NULL,
+  ALTER COLUMN steps SET DEFAULT 0,
+  ALTER COLUMN steps SET NOT NULL,
+  ALTER COLUMN water_intake SET DEFAULT 0,
+  ALTER COLUMN water_intake SET NOT NULL;
+
+-- The composite index also serves user_id-only lookups
+DROP INDEX IF EXISTS ix_daily_health_user_id;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_daily_health_user_date ON daily_health(user_id, date);
@@ -0,0 +1,52 @@
+-- SQLite version of 003_daily_health_native_types.sql. SQLite can't change
+-- column types in place, so the table is rebuilt. Applied automatically by
+-- init_db when daily_health has no date column.
+
+CREATE TABLE daily_health_new (
+  id UUID NOT NULL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  date DATE NOT NULL,
+  steps INTEGER NOT NULL DEFAULT 0,
+  steps_goal INTEGER NOT NULL DEFAULT 10000,
+  water_intake INTEGER NOT NULL DEFAULT 0,
+  water_goal INTEGER NOT NULL DEFAULT 8,
+  sleep_hours FLOAT,
+  weight FLOAT,
+  mood VARCHAR(50),
+  notes TEXT,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- File existing rows under the day they were created, keeping the most
+-- recently updated row per user and day
+INSERT INTO daily_health_new (
+  id, user_id, date, steps, water_intake, sleep_hours, mood, notes, created_at, updated_at
+)
+SELECT
+  id,
+  user_id,
+  day,
+  MAX(CAST(ROUND(CAST(TRIM(COALESCE(steps, '')) AS REAL)) AS INTEGER), 0),
+  MAX(CAST(ROUND(CAST(TRIM(COALESCE(water_intake, '')) AS REAL)) AS INTEGER), 0),
+  CASE WHEN TRIM(sleep_hours) GLOB '[0-9]*' THEN CAST(TRIM(sleep_hours) AS REAL) END,
+  mood,
+  notes,
+  created_at,
+  updated_at
+FROM (
+  SELECT
+    *,
+    date(COALESCE(created_at, CURRENT_TIMESTAMP)) AS day,
+    ROW_NUMBER() OVER (
+      PARTITION BY user_id, date(COALESCE(created_at, CURRENT_TIMESTAMP))
+      ORDER BY COALESCE(updated_at, created_at) DESC, id DESC
+    ) AS position
+  FROM daily_health
+)
+WHERE position = 1;
+
+DROP TABLE daily_health;
+ALTER TABLE daily_health_new RENAME TO daily_health;
+
+CREATE UNIQUE INDEX ix_daily_health_user_date ON daily_health(user_id, date);
@@ -0,0 +1,14 @@
+-- Intraday wearable samples (minute step counts, sleep stages), keyed by
+-- (user_id, metric, ts) with epoch-second timestamps
+CREATE TABLE IF NOT EXISTS health_samples (
+  user_id UUID NOT NULL,
+  metric SMALLINT NOT NULL,
+  ts BIGINT NOT NULL,
+  value INTEGER NOT NULL,
+  duration INTEGER NOT NULL DEFAULT 60,
+  PRIMARY KEY (user_id, metric, ts)
+);
+
+-- Store rows in key order so range scans touch few pages. PostgreSQL
+-- doesn't keep this up on insert; re-run CLUSTER after large backfills.
+CLUSTER health_samples USING health_samples_pkey;
@@ -0,0 +1,72 @@
+-- Weekly/monthly rollups of daily_health and per-user steps streaks, kept
+-- up to date by the API on every daily_health write. Existing history is
+-- summarized here once.
+
+CREATE TABLE IF NOT EXISTS health_rollups (
+  user_id UUID NOT NULL,
+  period VARCHAR(10) NOT NULL,
+  period_start DATE NOT NULL,
+  days_logged INTEGER NOT NULL DEFAULT 0,
+  steps_total INTEGER NOT NULL DEFAULT 0,
+  steps_goal_days INTEGER NOT NULL DEFAULT 0,
+  water_total INTEGER NOT NULL DEFAULT 0,
+  water_goal_days INTEGER NOT NULL DEFAULT 0,
+  sleep_hours_avg DOUBLE PRECISION,
+  weight_avg DOUBLE PRECISION,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (user_id, period, period_start)
+);
+
+CREATE TABLE IF NOT EXISTS health_streaks (
+  user_id UUID NOT NULL PRIMARY KEY,
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  longest_streak INTEGER NOT NULL DEFAULT 0,
+  last_goal_day DATE,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Weeks start on Monday, as date_trunc('week') does
+INSERT INTO health_rollups (
+  user_id, period, period_start, days_logged, steps_total, steps_goal_days,
+  water_total, water_goal_days, sleep_hours_avg, weight_avg
+)
+SELECT
+  user_id,
+  period,
+  period_start,
+  COUNT(*),
+  SUM(steps),
+  SUM(CASE WHEN steps_goal > 0 AND steps >= steps_goal THEN 1 ELSE 0 END),
+  SUM(water_intake),
+  SUM(CASE WHEN water_goal > 0 AND water_intake >= water_goal THEN 1 ELSE 0 END),
+  AVG(sleep_hours),
+  AVG(weight)
+FROM (
+  SELECT d.*, p.period, date_trunc(p.period, d.date)::date AS period_start
+  FROM daily_health d
+  CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+) days
+GROUP BY user_id, period, period_start
+ON CONFLICT (user_id, period, period_start) DO NOTHING;
+
+-- Consecutive goal days share date - row_number(); each such group is a run
+INSERT INTO health_streaks (user_id, current_streak, longest_streak, last_goal_day)
+SELECT DISTINCT ON (user_id)
+  user_id,
+  length,
+  MAX(length) OVER (PARTITION BY user_id),
+  last_day
+FROM (
+  SELECT user_id, COUNT(*) AS length, MAX(date) AS last_day
+  FROM (
+    SELECT
+      user_id,
+      date,
+      date - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date))::integer AS run
+    FROM daily_health
+    WHERE steps_goal > 0 AND steps >= steps_goal
+  ) goal_days
+  GROUP BY user_id, run
+) runs
+ORDER BY user_id, last_day DESC
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,72 @@
+-- SQLite version of 005_health_rollups.sql. Applied automatically by
+-- init_db when health_rollups doesn't exist yet.
+
+CREATE TABLE health_rollups (
+  user_id UUID NOT NULL,
+  period VARCHAR(10) NOT NULL,
+  period_start DATE NOT NULL,
+  days_logged INTEGER NOT NULL DEFAULT 0,
+  steps_total INTEGER NOT NULL DEFAULT 0,
+  steps_goal_days INTEGER NOT NULL DEFAULT 0,
+  water_total INTEGER NOT NULL DEFAULT 0,
+  water_goal_days INTEGER NOT NULL DEFAULT 0,
+  sleep_hours_avg FLOAT,
+  weight_avg FLOAT,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (user_id, period, period_start)
+);
+
+CREATE TABLE health_streaks (
+  user_id UUID NOT NULL PRIMARY KEY,
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  longest_streak INTEGER NOT NULL DEFAULT 0,
+  last_goal_day DATE,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 'weekday 0' moves to the coming Sunday; six days back is that week's Monday
+INSERT INTO health_rollups (
+  user_id, period, period_start, days_logged, steps_total, steps_goal_days,
+  water_total, water_goal_days, sleep_hours_avg, weight_avg
+)
+SELECT
+  user_id,
+  period,
+  period_start,
+  COUNT(*),
+  SUM(steps),
+  SUM(CASE WHEN steps_goal > 0 AND steps >= steps_goal THEN 1 ELSE 0 END),
+  SUM(water_intake),
+  SUM(CASE WHEN water_goal > 0 AND water_intake >= water_goal THEN 1 ELSE 0 END),
+  AVG(sleep_hours),
+  AVG(weight)
+FROM (
+  SELECT *, 'week' AS period, date(date, 'weekday 0', '-6 days') AS period_start FROM daily_health
+  UNION ALL
+  SELECT *, 'month' AS period, date(date, 'start of month') AS period_start FROM daily_health
+)
+GROUP BY user_id, period, period_start;
+
+INSERT INTO health_streaks (user_id, current_streak, longest_streak, last_goal_day)
+SELECT user_id, length, longest, last_day
+FROM (
+  SELECT
+    user_id,
+    length,
+    last_day,
+    MAX(length) OVER (PARTITION BY user_id) AS longest,
+    ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY last_day DESC) AS position
+  FROM (
+    SELECT user_id, COUNT(*) AS length, MAX(date) AS last_day
+    FROM (
+      SELECT
+        user_id,
+        date,
+        julianday(date) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date) AS run
+      FROM daily_health
+      WHERE steps_goal > 0 AND steps >= steps_goal
+    )
+    GROUP BY user_id, run
+  )
+)
+WHERE position = 1;
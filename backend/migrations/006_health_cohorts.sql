@@ -0,0 +1,29 @@
+-- Admin cohort analytics: a village per user, weekly per-village totals
+-- built from health_rollups, and the watermark of their incremental
+-- refresh. The API fills health_cohort_weekly on its first refresh.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS village VARCHAR(100);
+CREATE INDEX IF NOT EXISTS ix_users_village ON users(village);
+
+CREATE INDEX IF NOT EXISTS ix_health_rollups_updated_at ON health_rollups(updated_at);
+
+CREATE TABLE IF NOT EXISTS health_cohort_weekly (
+  village VARCHAR(100) NOT NULL,
+  week_start DATE NOT NULL,
+  users_reporting INTEGER NOT NULL DEFAULT 0,
+  days_logged INTEGER NOT NULL DEFAULT 0,
+  steps_total INTEGER NOT NULL DEFAULT 0,
+  steps_goal_days INTEGER NOT NULL DEFAULT 0,
+  water_total INTEGER NOT NULL DEFAULT 0,
+  water_goal_days INTEGER NOT NULL DEFAULT 0,
+  sleep_hours_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  sleep_users INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (village, week_start)
+);
+CREATE INDEX IF NOT EXISTS ix_health_cohort_weekly_week ON health_cohort_weekly(week_start);
+
+CREATE TABLE IF NOT EXISTS aggregate_watermarks (
+  name VARCHAR(100) NOT NULL PRIMARY KEY,
+  refreshed_through TIMESTAMPTZ NOT NULL
+);
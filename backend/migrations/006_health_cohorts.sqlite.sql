@@ -0,0 +1,8 @@
+-- SQLite version of the column and index changes in 006_health_cohorts.sql
+-- (the new tables are created by init_db). Applied automatically by
+-- init_db when users has no village column.
+
+ALTER TABLE users ADD COLUMN village VARCHAR(100);
+CREATE INDEX IF NOT EXISTS ix_users_village ON users(village);
+
+CREATE INDEX IF NOT EXISTS ix_health_rollups_updated_at ON health_rollups(updated_at);
@@ -0,0 +1,16 @@
+-- Rotating refresh tokens, stored only as SHA-256 hashes. Tokens rotated
+-- from the same login share a family_id; reusing a rotated token revokes
+-- the whole family. expires_at and revoked_at are UTC.
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+  id UUID NOT NULL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  token_hash VARCHAR(64) NOT NULL,
+  family_id UUID NOT NULL,
+  expires_at TIMESTAMP NOT NULL,
+  revoked_at TIMESTAMP,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens(token_hash);
+CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id ON refresh_tokens(user_id);
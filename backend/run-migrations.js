@@ -27,11 +27,14 @@ async function runMigration(migrationFile, migrationName) {
     const sqlPath = join(__dirname, 'migrations', migrationFile);
     const sql = readFileSync(sqlPath, 'utf-8');
     
-    // Split by semicolons but keep them, execute each statement
+    // Drop comment lines, split by semicolons and execute each statement
     const statements = sql
+      .split('\n')
+      .filter(line => !line.trim().startsWith('--'))
+      .join('\n')
       .split(';')
       .map(s => s.trim())
-      .filter(s => s.length > 0 && !s.startsWith('--'));
+      .filter(s => s.length > 0);
     
     for (const statement of statements) {
       if (statement.trim()) {
@@ -65,7 +68,12 @@ async function runAllMigrations() {
   
   const migrations = [
     { file: '001_medicines_tables.sql', name: 'Medicines & Prescription Orders Tables' },
-    { file: '002_lab_tests_tables.sql', name: 'Lab Tests & Bookings Tables' }
+    { file: '002_lab_tests_tables.sql', name: 'Lab Tests & Bookings Tables' },
+    { file: '003_daily_health_native_types.sql', name: 'Daily Health Native Column Types' },
+    { file: '004_health_samples.sql', name: 'Intraday Health Samples' },
+    { file: '005_health_rollups.sql', name: 'Health Rollups & Streaks' },
+    { file: '006_health_cohorts.sql', name: 'Health Cohort Analytics' },
+    { file: '007_refresh_tokens.sql', name: 'Refresh Tokens' }
   ];
   
   let successCount = 0;
@@ -85,7 +93,11 @@ async function runAllMigrations() {
     console.log('   - medicines (with 12 default medicines)');
     console.log('   - prescription_orders');
     console.log('   - lab_tests (with 15 default tests)');
-    console.log('   - test_bookings\n');
+    console.log('   - test_bookings');
+    console.log('   - daily_health (converted to native column types)');
+    console.log('   - health_samples');
+    console.log('   - health_rollups, health_streaks');
+    console.log('   - health_cohort_weekly, aggregate_watermarks (users.village added)\n');
   } else {
     console.log('⚠️  Some migrations failed. Check the errors above.');
     console.log('\n💡 Alternative: Copy the SQL files from backend/migrations/');
@@ -0,0 +1,22 @@
+"""
+Test configuration: settings are read at import time, so the environment
+is set up here, before any test module imports the app
+"""
+
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="dietec-test-")
+PRIMARY_PATH = os.path.join(_data_dir, "primary.db")
+REPLICA_PATH = os.path.join(_data_dir, "replica.db")
+
+# Two separate SQLite files stand in for a primary and its read replica;
+# nothing copies rows between them, so a test can tell which one answered
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY_PATH}"
+os.environ["DATABASE_READ_URL"] = f"sqlite+aiosqlite:///{REPLICA_PATH}"
+os.environ["READ_YOUR_WRITES_SECONDS"] = "0.5"
+os.environ["DEBUG"] = "false"
+os.environ["SUPABASE_KEY"] = ""
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["COHORT_REFRESH_SECONDS"] = "0"
@@ -0,0 +1,88 @@
+"""
+Read routing: GETs go to the replica, except for users who just wrote
+"""
+
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from main import app
+from app.core import database
+from app.core.config import settings
+from app.models.medical import BasicInfo
+
+
+@pytest_asyncio.fixture
+async def client():
+    await database.init_db()
+    async with database.read_engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await database.engine.dispose()
+    await database.read_engine.dispose()
+
+
+async def register(client: AsyncClient) -> tuple:
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={"email": f"{uuid.uuid4().hex}@example.com", "password": "correct-horse"}
+    )
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    me = await client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}"})
+    return me.json()["id"], {"Authorization": f"Bearer {token}"}
+
+
+async def add_replica_info(user_id: str, blood_type: str) -> None:
+    """Write a row to the replica file only."""
+    async with async_sessionmaker(database.read_engine)() as session:
+        session.add(BasicInfo(user_id=uuid.UUID(user_id), blood_type=blood_type))
+        await session.commit()
+
+
+async def blood_type(client: AsyncClient, headers: dict) -> str:
+    response = await client.get("/api/v1/medical/basic-info", headers=headers)
+    assert response.status_code == 200
+    return response.json()["bloodType"]
+
+
+async def save_info(client: AsyncClient, headers: dict, blood_type: str) -> None:
+    response = await client.post("/api/v1/medical/basic-info", headers=headers, json={"blood_type": blood_type})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_get_is_served_by_replica(client):
+    user_id, headers = await register(client)
+    await add_replica_info(user_id, "B+")
+
+    assert await blood_type(client, headers) == "B+"
+
+
+@pytest.mark.asyncio
+async def test_reads_stay_on_primary_after_a_write(client):
+    user_id, headers = await register(client)
+    await add_replica_info(user_id, "B+")
+
+    await save_info(client, headers, "O-")
+
+    assert user_id in database.recent_writers
+    assert await blood_type(client, headers) == "O-"
+
+
+@pytest.mark.asyncio
+async def test_reads_return_to_replica_once_the_pin_expires(client):
+    user_id, headers = await register(client)
+    await add_replica_info(user_id, "B+")
+    await save_info(client, headers, "O-")
+    assert await blood_type(client, headers) == "O-"
+
+    await asyncio.sleep(settings.READ_YOUR_WRITES_SECONDS + 0.1)
+
+    assert user_id not in database.recent_writers
+    assert await blood_type(client, headers) == "B+"